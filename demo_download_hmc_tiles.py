@@ -6,7 +6,7 @@ and supports both HERE Data SDK and OLP CLI as download methods.
 
 ------------
 Prerequisites:
-- Python 3.7+
+- Python 3.8+
 - Valid HERE Platform credentials (e.g., via environment variables or credentials file)
 - Required Python modules:
     - here.geotiles
@@ -54,11 +54,29 @@ Other Important Variables:
 
 - `download_method`: Choose download strategy:
     - DownloadMethod.DATA_SDK — Uses HERE Data SDK (requires credentials)
-    - DownloadMethod.OLP_CLI — Uses OLP CLI (must be installed)
+    - DownloadMethod.OLP_CLI — Uses OLP CLI (must be installed). Starts one CLI process per partition,
+      so it is much slower than the Data SDK; falls back to the Data SDK when `olp` is not on PATH.
 
 - `available_layers`: Optionally specify which layers to download manually.
     If left empty, all heretile layers from the selected catalog will be used.
 
+- `parallel_layers`: Number of layers downloaded concurrently (one thread per layer).
+
+- `tile_concurrency`: Total number of partition chunks fetched concurrently across all layers (Data SDK only).
+    It is split evenly between the layers downloading at the same time, and each layer also gets the same number
+    of writer threads, so one run uses at most `parallel_layers` + 2 × `tile_concurrency` download threads
+    (132 with the defaults) and at most `tile_concurrency` platform requests in flight.
+
+- `overwrite`: If False, partitions of a layer that already have an output file under `decoded/` are not downloaded again.
+    Only files in the current `file_format` (or the OLP CLI output, when using OLP CLI) and, if `download_version`
+    is set, of that version count.
+
+- `file_format`: Output format of the Data SDK download method:
+    - FileFormat.JSON — Decoded partition as JSON
+    - FileFormat.TXTBP — Decoded partition as protobuf text format
+    - FileFormat.PROTOBUF — Raw protobuf bytes, written without decoding (fastest, smallest)
+    - FileFormat.JSON_GZIP — Decoded partition as gzip-compressed JSON (.json.gz), several times smaller than JSON
+
 ------------
 Execution:
 
@@ -68,94 +86,345 @@ After setting the appropriate options in `main()`, run the script:
 
 The script will:
 - Print HERE Platform connection status
-- Resolve partition (tile) IDs based on your selection
 - Fetch available layers in the catalog
+- Prefetch layer schemas in the background while resolving partition (tile) IDs based on your selection
 - Download the selected layers using the chosen method
 - Display schema information if available
 
 ------------
 Tips:
 - Enable or disable layer sets in the `hmc_rib_2_layers`, `hdlm_weu_layers`, or `hmc_external_references_layers` lists.
-- Add logging or output redirection if running in batch mode or automation.
+- Progress messages go through the `logging` module; adjust the root logger's handlers or level for batch mode or automation.
 
 """
 
 
+import functools
 import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 import here.geotiles.heretile as heretile
+import numpy as np
 from here.geotiles.heretile import BoundingBox, GeoCoordinate
-from here.platform import Platform
 
 from hmc_download_options import FileFormat, HerePlatformCatalog, DownloadMethod
-from hmc_downloader import HmcDownloader
+from hmc_downloader import HmcDownloader, get_catalog, get_platform
+
+# 各 catalog 的 HRN 與 heretile level (唯讀)
+CATALOG_HRN_LEVEL_MAP = MappingProxyType(
+    {
+        HerePlatformCatalog.HMC_RIB_2: ("hrn:here:data::olp-here:rib-2", 12),
+        HerePlatformCatalog.HDLM_WEU_2: (
+            "hrn:here:data::olp-here-had:here-hdlm-protobuf-weu-2",
+            14,
+        ),
+        HerePlatformCatalog.HMC_EXT_REF_2: (
+            "hrn:here:data::olp-here:rib-external-references-2",
+            12,
+        ),
+    }
+)
+
+# 已知版本的圖層 schema HRN 快取，以 (catalog HRN, 圖層, 版本) 為鍵
+SCHEMA_CACHE_FILE = os.path.join("decoded", ".schema_cache.json")
+
+log = logging.getLogger(__name__)
+
+
+def start_log_listener():
+    """
+    訊息先放入佇列，由單一背景執行緒依序輸出，下載執行緒不必等待 stdout。
+    回傳的 QueueListener 需在程式結束前呼叫 stop()。
+    """
+    log_queue = queue.Queue()
+    stream_handler = logging.StreamHandler(sys.stdout)  # 與原本的 print 一樣輸出到 stdout
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(logging.INFO)
+    listener.start()
+    return listener
+
+
+def _spread_bits(v):
+    # 將 32 位元整數的每個位元間隔一位展開 (Morton code, SWAR)
+    v = v & np.uint64(0x00000000FFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def _compact_bits(v):
+    # _spread_bits 的反運算：取出偶數位元並合併成 32 位元整數
+    v = v & np.uint64(0x5555555555555555)
+    v = (v | (v >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    v = (v | (v >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return v
+
+
+def quad_key_dtype(level):
+    # level 15 以下的 quad longkey 最多 31 位元，可用 uint32 儲存
+    return np.uint32 if level <= 15 else np.uint64
+
+
+def pack(level, x, y):
+    """
+    將 tile 的 level 與 x、y 欄列編號組成 HERE quad longkey (可傳入 NumPy 陣列)。
+    """
+    x = np.asarray(x, dtype=np.uint64)
+    y = np.asarray(y, dtype=np.uint64)
+    quad_keys = (_spread_bits(y) << np.uint64(1)) | _spread_bits(x) | np.uint64(1 << (2 * level))
+    return quad_keys.astype(quad_key_dtype(level))
+
+
+def unpack(quad_key):
+    """
+    將單一 HERE quad longkey 拆回 (level, x, y)。
+    """
+    quad_key = int(quad_key)
+    level = (quad_key.bit_length() - 1) // 2
+    morton = np.uint64(quad_key ^ (1 << (2 * level)))
+    return level, int(_compact_bits(morton)), int(_compact_bits(morton >> np.uint64(1)))
+
+
+def _narrow_quad_keys(quad_keys, level):
+    # 在數值範圍允許時改用 uint32 儲存
+    dtype = quad_key_dtype(level)
+    if dtype is np.uint32 and quad_keys.size and quad_keys.max() > np.iinfo(np.uint32).max:
+        return quad_keys
+    return quad_keys.astype(dtype, copy=False)
+
+
+def tiles_in_bounding_box(west, south, east, north, level):
+    """
+    以 NumPy 一次算出 bounding box 內所有 HERE tile 的 quad longkey (已排序，level 15 以下為 uint32 陣列)。
+    跨越 180 度經線或 level 大於 20 時改用 heretile.in_bounding_box。
+    """
+    if west <= east:
+        south_west_tile = heretile.from_coordinates(west, south, level)
+        if south_west_tile == heretile.from_coordinates(east, north, level):
+            # 整個 bounding box 落在同一個 tile 內
+            return np.array([south_west_tile], dtype=quad_key_dtype(level))
+    if level > 20 or west > east:
+        return np.sort(
+            np.fromiter(heretile.in_bounding_box(west, south, east, north, level), dtype=quad_key_dtype(level))
+        )
+    tile_size = 360.0 / (1 << level)
+    x_min, x_max = np.clip(
+        np.floor((np.array([west, east]) + 180.0) / tile_size), 0, (1 << level) - 1
+    ).astype(np.uint64)
+    y_min, y_max = np.clip(
+        np.floor((np.array([south, north]) + 90.0) / tile_size), 0, max((1 << level) // 2 - 1, 0)
+    ).astype(np.uint64)
+    xs, ys = np.meshgrid(
+        np.arange(x_min, x_max + np.uint64(1), dtype=np.uint64),
+        np.arange(y_min, y_max + np.uint64(1), dtype=np.uint64),
+    )
+    quad_keys = pack(level, xs.ravel(), ys.ravel())
+    quad_keys.sort()
+    return quad_keys
 
 
 class GeoQuery:
-    def __init__(self, catalog, download_target, country_list_tuple=None):
+    def __init__(self, catalog, download_target, country_list_tuple=None, version=None):
         self.catalog = catalog
         self.download_target = download_target
         self.country_list_tuple = country_list_tuple
-        self.here_quad_longkey_list = []
+        self.version = version
+        # TILE ID 以 uint64 陣列保存 (level 15 以下為 uint32)，每個 tile 只佔 8 (或 4) bytes
+        self.here_quad_longkey_list = np.empty(0, dtype=np.uint64)
 
     def resolve_tile_ids(self, level):
         if isinstance(self.download_target, GeoCoordinate):
-            self.here_quad_longkey_list = [
-                heretile.from_coordinates(
-                    self.download_target.lng, self.download_target.lat, level
-                )
-            ]
+            self.here_quad_longkey_list = np.array(
+                [
+                    heretile.from_coordinates(
+                        self.download_target.lng, self.download_target.lat, level
+                    )
+                ],
+                dtype=quad_key_dtype(level),
+            )
         elif isinstance(self.download_target, BoundingBox):
-            self.here_quad_longkey_list = list(
-                heretile.in_bounding_box(
-                    self.download_target.west,
-                    self.download_target.south,
-                    self.download_target.east,
-                    self.download_target.north,
-                    level,
-                )
+            # HERE quad longkey 的位元已交錯排列，數值排序即為 Z-order，相鄰的 tile 會連續下載
+            self.here_quad_longkey_list = tiles_in_bounding_box(
+                self.download_target.west,
+                self.download_target.south,
+                self.download_target.east,
+                self.download_target.north,
+                level,
             )
         elif isinstance(self.download_target, list):
-            self.here_quad_longkey_list = self.download_target
+            self.here_quad_longkey_list = _narrow_quad_keys(
+                np.sort(np.asarray(self.download_target, dtype=np.uint64)), level
+            )
         elif isinstance(self.download_target, tuple):
             self.get_tile_ids_by_country()
+            self.here_quad_longkey_list = _narrow_quad_keys(self.here_quad_longkey_list, level)
 
     def get_tile_ids_by_country(self):
         if not self.country_list_tuple:
-            print("No country list provided, skipping country-based tile ID retrieval.")
+            log.info("No country list provided, skipping country-based tile ID retrieval.")
             return
 
-        indexed_locations_layer = "indexed-locations"
-        tile_id_list_per_country = HmcDownloader(
-            catalog=self.catalog,
-            layer=indexed_locations_layer,
-            file_format=FileFormat.JSON,
-        ).get_country_tile_indexes(self.country_list_tuple)
-        for tile_id_list in tile_id_list_per_country:
-            self.here_quad_longkey_list.append(tile_id_list)
+        # 指定版本時，各國的 TILE ID 會快取在磁碟上，之後執行不必再下載 indexed-locations
+        tile_ids_per_country = {}
+        for iso_country_code in self.country_list_tuple:
+            for dtype in (np.uint32, np.uint64):
+                cache_path = self._country_tile_cache_path(iso_country_code, dtype)
+                if cache_path and os.path.exists(cache_path):
+                    tile_ids_per_country[iso_country_code] = np.load(cache_path, mmap_mode="r")
+                    break
+        missing_countries = tuple(
+            iso_country_code
+            for iso_country_code in self.country_list_tuple
+            if iso_country_code not in tile_ids_per_country
+        )
+        if missing_countries:
+            indexed_locations_layer = "indexed-locations"
+            tile_id_list_per_country = HmcDownloader(
+                catalog=self.catalog,
+                layer=indexed_locations_layer,
+                file_format=FileFormat.JSON,
+            ).get_country_tile_indexes(missing_countries, self.version)
+            for tile_id_dict in tile_id_list_per_country:
+                for iso_country_code, tile_id_list in tile_id_dict.items():
+                    tile_ids = np.asarray(tile_id_list, dtype=np.uint64)
+                    if tile_ids.size:
+                        # level 15 以下的 TILE ID 改存成與 pack() 相同的 uint32 形式
+                        tile_ids = _narrow_quad_keys(tile_ids, (int(tile_ids.max()).bit_length() - 1) // 2)
+                    tile_ids_per_country[iso_country_code] = tile_ids
+                    cache_path = self._country_tile_cache_path(iso_country_code, tile_ids.dtype.type)
+                    if cache_path:
+                        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                        temp_path = cache_path[: -len(".npy")] + ".tmp.npy"
+                        np.save(temp_path, tile_ids)
+                        os.replace(temp_path, cache_path)
+        # 攤平成單一 TILE ID 陣列，並移除多個國家共用的重複 tile (np.unique 的結果已排序)
+        tile_ids = np.concatenate(
+            [np.empty(0, dtype=np.uint64)] + list(tile_ids_per_country.values())
+        )
+        unique_tile_ids = np.unique(tile_ids)
+        log.info(
+            "Country tile IDs: %d (%d duplicates removed)",
+            len(unique_tile_ids),
+            len(tile_ids) - len(unique_tile_ids),
+        )
+        self.here_quad_longkey_list = unique_tile_ids
+
+    def _country_tile_cache_path(self, iso_country_code, dtype):
+        # 未指定版本 (最新版) 時不使用快取，避免讀到舊版本的 TILE ID
+        # uint32 的 TILE ID 存成 <國碼>.u32.npy，uint64 的存成 <國碼>.npy
+        if self.version is None:
+            return None
+        return os.path.join(
+            "decoded",
+            self.catalog.hrn.replace(":", "_"),
+            "country_tiles",
+            "v{}".format(self.version),
+            "{}{}".format(iso_country_code, ".u32.npy" if dtype is np.uint32 else ".npy"),
+        )
 
 
 class LayerDownloader:
-    def __init__(self, platform, catalog, version, method):
+    def __init__(self, platform, catalog, version, method, parallel_layers=4, tile_concurrency=64, overwrite=False,
+                 file_format=FileFormat.JSON):
         self.platform = platform
         self.catalog = catalog
         self.available_layers = []
         self.version = version
+        if method == DownloadMethod.OLP_CLI and shutil.which("olp") is None:
+            # 找不到 OLP CLI 時改用 Data SDK，避免每個 partition 都啟動失敗
+            log.warning("* OLP CLI not found on PATH, falling back to Data SDK")
+            method = DownloadMethod.DATA_SDK
         self.method = method
+        self.parallel_layers = parallel_layers
+        self.tile_concurrency = tile_concurrency
+        self.overwrite = overwrite
+        self.file_format = file_format
+        self._schema_executor = None
+        self._schema_futures = {}
+        self._schema_cache_lock = threading.Lock()
+        self._schema_cache = self._load_schema_cache()
+
+    @functools.cached_property
+    def _details(self):
+        # catalog 的詳細資料只向平台取得一次
+        return self.catalog.get_details()
+
+    @staticmethod
+    def _load_schema_cache():
+        if not os.path.exists(SCHEMA_CACHE_FILE):
+            return {}
+        with open(SCHEMA_CACHE_FILE, mode="r", encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+
+    def _get_schema_hrn(self, downloader):
+        """
+        取得圖層的 schema HRN。指定版本時會寫入 SCHEMA_CACHE_FILE，之後執行不必再向平台查詢。
+        """
+        cache_key = "{}|{}|{}".format(self.catalog.hrn, downloader.layer, self.version)
+        if self.version is not None:
+            with self._schema_cache_lock:
+                if cache_key in self._schema_cache:
+                    return self._schema_cache[cache_key]
+        schema = downloader.get_schema()
+        schema_hrn = schema.schema_hrn if schema else None
+        if self.version is not None:
+            with self._schema_cache_lock:
+                self._schema_cache[cache_key] = schema_hrn
+                os.makedirs(os.path.dirname(SCHEMA_CACHE_FILE), exist_ok=True)
+                with open(SCHEMA_CACHE_FILE, mode="w", encoding="utf-8") as cache_file:
+                    json.dump(self._schema_cache, cache_file, indent="    ")
+        return schema_hrn
+
+    def prefetch_schemas(self, layers):
+        """
+        在背景執行緒預先取得各圖層的 schema，讓網路請求與 TILE ID 的計算同時進行。
+
+        :param layers: 要下載的圖層列表
+        """
+        if not layers:
+            return
+        self._schema_executor = ThreadPoolExecutor(
+            max_workers=max(1, min(len(layers), self.parallel_layers))
+        )
+        for layer in layers:
+            downloader = HmcDownloader(
+                catalog=self.catalog,
+                layer=layer["layer_id"],
+                file_format=self.file_format,
+                version=self.version,
+            )
+            self._schema_futures[layer["layer_id"]] = self._schema_executor.submit(
+                self._get_schema_hrn, downloader
+            )
 
     def fetch_available_layers(self):
         """
         取得可用的圖層列表，並返回這些圖層。
         """
-        catalog_details = json.loads(json.dumps(self.catalog.get_details()))
+        catalog_details = self._details
         catalog_layers = catalog_details["layers"]
-        print("Available layers: ")
+        log.info("Available layers: ")
         self.available_layers = []
         for layer in catalog_layers:
-            print(
-                "* {} | {} | {} | {}".format(
-                    layer["id"], layer["name"], layer["hrn"], layer["tags"]
-                )
+            log.info(
+                "* %s | %s | %s | %s", layer["id"], layer["name"], layer["hrn"], layer["tags"]
             )
             if layer["partitioningScheme"] == "heretile":
                 self.available_layers.append(
@@ -168,52 +437,83 @@ class LayerDownloader:
 
     def download_layers(self, layers_to_download, here_quad_longkey_list):
         """
-        下載選定的圖層。
+        下載選定的圖層，每個圖層在獨立的執行緒中下載。
 
         :param layers_to_download: 要下載的圖層列表
-        :param here_quad_longkey_list: 要下載的 TILE ID 列表
+        :param here_quad_longkey_list: 要下載的 TILE ID 陣列 (uint32 或 uint64)
         """
         if not layers_to_download:
-            print("No layers specified for download.")
+            log.info("No layers specified for download.")
             return
 
-        print("Downloading layers:", layers_to_download)
-        for layer in layers_to_download:
-            print("* Downloading {}".format(layer["layer_id"]))
-            downloader = HmcDownloader(
-                catalog=self.catalog,
-                layer=layer["layer_id"],
-                file_format=FileFormat.JSON,
+        log.info("Downloading layers: %s", layers_to_download)
+        max_workers = max(1, min(len(layers_to_download), self.parallel_layers))
+        # tile_concurrency 是所有圖層共用的上限，平均分給同時下載的圖層
+        layer_concurrency = max(1, self.tile_concurrency // max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(
+                executor.map(
+                    lambda layer: self._download_one_layer(layer, here_quad_longkey_list, layer_concurrency),
+                    layers_to_download,
+                )
+            )
+        if self._schema_executor:
+            self._schema_executor.shutdown(wait=False)
+
+        log.info("Download complete.")
+
+    def _download_one_layer(self, layer, here_quad_longkey_list, layer_concurrency):
+        """
+        下載單一圖層，最多同時讀取 layer_concurrency 批 partition，並以同樣數量的執行緒寫檔。
+        """
+        log.info("* Downloading %s", layer["layer_id"])
+        downloader = HmcDownloader(
+            catalog=self.catalog,
+            layer=layer["layer_id"],
+            file_format=self.file_format,
+            version=self.version,
+            max_workers=layer_concurrency,
+        )
+
+        # 交給 Data SDK / OLP CLI 前才轉回 Python int 列表
+        quad_ids = np.asarray(here_quad_longkey_list).tolist()
+        if not self.overwrite:
+            # 略過已存在於磁碟上的 partition
+            downloaded = downloader.get_downloaded_partition_ids(
+                "heretile", quad_ids, olp_cli=self.method == DownloadMethod.OLP_CLI
+            )
+            if downloaded:
+                log.info("* %s: %d partitions already downloaded, skipped", layer["layer_id"], len(downloaded))
+                quad_ids = [q for q in quad_ids if q not in downloaded]
+
+        if quad_ids and self.method == DownloadMethod.DATA_SDK:
+            downloader.download_partitioned_layer(
+                quad_ids=quad_ids,
+                write_to_file=True,
                 version=self.version,
+                concurrency=layer_concurrency,
             )
 
-            if self.method == DownloadMethod.DATA_SDK:
-                downloader.download_partitioned_layer(
-                    quad_ids=here_quad_longkey_list,
+        if quad_ids and self.method == DownloadMethod.OLP_CLI:
+            try:
+                downloader.olp_cli_download_partition(
+                    tiling_scheme='heretile',
+                    quad_ids=quad_ids,
                     write_to_file=True,
                     version=self.version,
                 )
+            except RuntimeError:
+                pass
 
-            if self.method == DownloadMethod.OLP_CLI:
-                try:
-                    downloader.olp_cli_download_partition(
-                        tiling_scheme='heretile',
-                        quad_ids=here_quad_longkey_list,
-                        write_to_file=True,
-                        version=self.version,
-                    )
-                except RuntimeError:
-                    pass
-
-            if downloader.get_schema():
-                print("* Schema: {}".format(downloader.get_schema().schema_hrn))
-
-        print("Download complete.")
+        schema_future = self._schema_futures.get(layer["layer_id"])
+        schema_hrn = schema_future.result() if schema_future else self._get_schema_hrn(downloader)
+        if schema_hrn:
+            log.info("* Schema: %s", schema_hrn)
 
 
 def main():
-    platform = Platform()
-    print("HERE Platform Status:", platform.get_status())
+    platform = get_platform()
+    log.info("HERE Platform Status: %s", platform.get_status())
 
     # 選項1：下載經緯度所在的partition
     download_center = GeoCoordinate(lat=51.664415000000005, lng=-3.80175)
@@ -241,33 +541,27 @@ def main():
     # 選項7：選擇要下載的catalog
     catalog = HerePlatformCatalog.HMC_RIB_2
 
-    hrn_map = {
-        HerePlatformCatalog.HMC_RIB_2: ("hrn:here:data::olp-here:rib-2", 12),
-        HerePlatformCatalog.HDLM_WEU_2: (
-            "hrn:here:data::olp-here-had:here-hdlm-protobuf-weu-2",
-            14,
-        ),
-        HerePlatformCatalog.HMC_EXT_REF_2: (
-            "hrn:here:data::olp-here:rib-external-references-2",
-            12,
-        ),
-    }
+    hrn, level = CATALOG_HRN_LEVEL_MAP[catalog]
+    platform_catalog = get_catalog(hrn)
 
-    hrn, level = hrn_map[catalog]
-    platform_catalog = platform.get_catalog(hrn=hrn)
+    # 選擇下載使用Data SDK或是OLP CLI (OLP CLI 需要另外安裝，每個 partition 會啟動一次 CLI，速度較慢)
+    download_method = DownloadMethod.DATA_SDK
 
-    geo_query = GeoQuery(platform_catalog, download_target, country_list_tuple)
-    geo_query.resolve_tile_ids(level)
+    # 選項9：同時下載的圖層數量，以及所有圖層合計同時下載的 partition 批次數量 (Data SDK，平均分給各圖層)
+    parallel_layers = 4
+    tile_concurrency = 64
 
-    if not geo_query.here_quad_longkey_list:
-        print("No tile/partition ID presented, quit.")
-        return
+    # 選項10：是否重新下載已存在於磁碟上的 partition
+    overwrite = False
 
-    # 選擇下載使用Data SDK或是OLP CLI (OLP CLI 需要另外安裝)
-    download_method = DownloadMethod.OLP_CLI
+    # 選項11：Data SDK 下載的輸出格式 (JSON、TXTBP、未解碼的 PROTOBUF 或 gzip 壓縮的 JSON_GZIP)
+    file_format = FileFormat.JSON
 
     # 下載圖層的流程
-    layer_downloader = LayerDownloader(platform, platform_catalog, download_version, download_method)
+    layer_downloader = LayerDownloader(
+        platform, platform_catalog, download_version, download_method, parallel_layers, tile_concurrency, overwrite,
+        file_format
+    )
 
     # 選項8：選擇要下載的圖層
 
@@ -340,15 +634,30 @@ def main():
         if len(hmc_external_references_layers) > 0:
             available_layers.extend(hmc_external_references_layers)
 
-    # 開始下載
     if len(available_layers) > 0:
         layers_to_download = available_layers
     else:
         layers_to_download = layer_downloader.fetch_available_layers()
+
+    # 計算 TILE ID 的同時，在背景先取得各圖層的 schema
+    layer_downloader.prefetch_schemas(layers_to_download)
+
+    geo_query = GeoQuery(platform_catalog, download_target, country_list_tuple, download_version)
+    geo_query.resolve_tile_ids(level)
+
+    if len(geo_query.here_quad_longkey_list) == 0:
+        log.info("No tile/partition ID presented, quit.")
+        return
+
+    # 開始下載
     layer_downloader.download_layers(
         layers_to_download, geo_query.here_quad_longkey_list
     )
 
 
 if __name__ == "__main__":
-    main()
+    log_listener = start_log_listener()
+    try:
+        main()
+    finally:
+        log_listener.stop()
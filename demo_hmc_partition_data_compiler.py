@@ -1,55 +1,52 @@
 import os
+import subprocess
+import sys
 
 rib2_partition_path = r'decoded/hrn_here_data__olp-here_rib-2/heretile'
 ext_ref2_partition_path = r'decoded/hrn_here_data__olp-here_rib-external-references-2/'
 overwrite = 'y'
+failed_runs = []  # (converter script, partition folder) of every run that returned non-zero
+
+rib2_converter_scripts = [
+    'hmc_topology_to_geojson.py',
+    'hmc_road_based_attributes_to_geojson.py',
+    'hmc_address_locations_to_geojson.py',
+    'hmc_polygon_to_geojson.py',
+    'hmc_places_to_geojson.py',
+    'hmc_enhanced_buildings_to_geojson.py',
+    'hmc_postal_code_points_to_geojson.py',
+    'hmc_landmarks_to_geojson.py',
+    'hmc_parking_areas_to_geojson.py',
+    'hmc_lane_attributes_to_geojson.py',
+    'hmc_evcp_v2_to_geojson.py',
+]
+
+
+def run_converter(script, partition_folder):
+    # Run the converter with the current interpreter, passing the arguments as a list so no shell is involved
+    print('running "python {} {} {}"'.format(script, partition_folder, overwrite))
+    result = subprocess.run([sys.executable, script, partition_folder, overwrite], check=False)
+    if result.returncode != 0:
+        # Keep converting the other partitions, and report the failure at the end
+        print('{} failed on {} (return code: {})'.format(script, partition_folder, result.returncode))
+        failed_runs.append((script, partition_folder))
+
 
 for r, ds, fs in os.walk(rib2_partition_path):
     if len(ds) > 0:
         for d in ds:
             partition_folder = os.path.join(r, d)
-
-            os.system('echo running "python hmc_topology_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-            os.system('python hmc_topology_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-            
-            os.system('echo running "python hmc_road_based_attributes_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_road_based_attributes_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_address_locations_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_address_locations_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_polygon_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_polygon_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_places_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_places_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_enhanced_buildings_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_enhanced_buildings_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_postal_code_points_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_postal_code_points_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_landmarks_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_landmarks_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_parking_areas_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_parking_areas_to_geojson.py {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_postal_code_points_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_postal_code_points_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_lane_attributes_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_lane_attributes_to_geojson.py {} {}"'.format(partition_folder, overwrite))
-
-            os.system('echo running "python hmc_evcp_v2_to_geojson.py {}"'.format(partition_folder))
-            os.system('python hmc_evcp_v2_to_geojson.py {} {}"'.format(partition_folder, overwrite))
+            for converter_script in rib2_converter_scripts:
+                run_converter(converter_script, partition_folder)
 
 for r, ds, fs in os.walk(ext_ref2_partition_path):
     if len(ds) > 0:
         for d in ds:
             ext_ref_partition_folder = os.path.join(r, d)
-            os.system('echo running "python hmc_external_reference_attributes_to_geojson.py {}"'.format(
-                ext_ref_partition_folder))
-            os.system('python hmc_external_reference_attributes_to_geojson.py {} {}"'.format(ext_ref_partition_folder,
-                                                                                             overwrite))
+            run_converter('hmc_external_reference_attributes_to_geojson.py', ext_ref_partition_folder)
+
+if failed_runs:
+    print('{} converter runs failed:'.format(len(failed_runs)))
+    for failed_script, failed_partition_folder in failed_runs:
+        print('  {} {}'.format(failed_script, failed_partition_folder))
+    sys.exit(1)
@@ -3,12 +3,11 @@ import os
 import re
 
 import geojson
-from here.platform import Platform
 from progressbar import ProgressBar
 
 import hmc_layer_cross_referencing
 from hmc_download_options import FileFormat
-from hmc_downloader import HmcDownloader
+from hmc_downloader import HmcDownloader, get_catalog, get_platform
 
 polygon_feature_layers = ['address-locations']
 
@@ -115,11 +114,11 @@ if __name__ == '__main__':
                                                               'administrative-place-profiles']
                                 print(
                                     'download admin reference layers: {}'.format(', '.join(admin_reference_layer_list)))
-                                platform = Platform()
+                                platform = get_platform()
                                 env = platform.environment
                                 config = platform.platform_config
                                 print('HERE Platform Status: ', platform.get_status())
-                                platform_catalog = platform.get_catalog(hrn='hrn:here:data::olp-here:rib-2')
+                                platform_catalog = get_catalog('hrn:here:data::olp-here:rib-2')
                                 for admin_partition in list(from_street_section_ref_partition_name_set):
                                     for admin_reference_layer in admin_reference_layer_list:
                                         HmcDownloader(catalog=platform_catalog, layer=admin_reference_layer,
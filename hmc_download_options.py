@@ -4,6 +4,8 @@ from enum import Enum
 class FileFormat(Enum):
     JSON = 1
     TXTBP = 2
+    PROTOBUF = 3  # Raw protobuf wire format, as stored on the platform
+    JSON_GZIP = 4  # JSON compressed with gzip (.json.gz)
 
 
 class QueryType(Enum):
@@ -2,20 +2,209 @@
 This code defines a class HmcDownloader that is responsible for downloading
 and processing data from the HERE platform. It provides methods to retrieve
 schema, download data, and extract country tile and admin indexes.
+
+JSON output is encoded with orjson when it is installed, otherwise with the
+standard library json module.
+
+get_platform() and get_catalog() return process-wide Platform and Catalog
+handles, so all tools in a run share one SDK session.
 """
 
+import asyncio
+import functools
+import gzip
+import io
+import itertools
 import json
+import logging
+import math
 import os
+import queue
+import shutil
 import subprocess
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from typing import Optional, List
 
-from google.protobuf.json_format import MessageToJson
+import numpy as np
+from google.protobuf import text_format
+from google.protobuf.json_format import MessageToDict
+from here.platform import Platform
 from here.platform.adapter import DecodedMessage
 from here.platform.catalog import Catalog
 from here.platform.partition import Partition
 
 from hmc_download_options import FileFormat
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Shared decoder for the standard-library fallback of _json_loads
+_JSON_DECODE = json.JSONDecoder().decode
+
+# Tells a writer thread that every fetch worker has finished
+_FETCH_DONE = object()
+
+# File extension of each output format
+_FILE_EXTENSIONS = {
+    FileFormat.TXTBP: "txtbp",
+    FileFormat.JSON: "json",
+    FileFormat.PROTOBUF: "pb",
+    FileFormat.JSON_GZIP: "json.gz",
+}
+
+# gzip level of FileFormat.JSON_GZIP; the repetitive HMC JSON already shrinks several times
+# at the fastest level, higher levels mostly cost CPU
+_GZIP_COMPRESS_LEVEL = 1
+
+# Write buffer of partition output files; the json.dump fallback writes many small chunks
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Partition IDs per 'olp ... partition list --filter' call, which keeps the command line
+# well under the 8191 character limit of Windows
+_OLP_FILTER_BATCH_SIZE = 500
+
+# Partition IDs per partition metadata request of the Data SDK
+_METADATA_BATCH_SIZE = 100
+
+# Country index results of this process, keyed by
+# (catalog HRN, layer, method, ISO country code tuple, version)
+_country_index_cache = {}
+
+# Partition versions listed with the OLP CLI in this process, keyed by (catalog HRN, layer)
+_partition_version_cache = {}
+
+# Keeps lines printed by concurrent writer threads from interleaving
+_print_lock = threading.Lock()
+
+
+def _print(*args):
+    with _print_lock:
+        print(*args)
+
+
+def _prefetch(iterable, maxsize: int = 16):
+    """
+    Yield the items of iterable while a background thread fetches up to maxsize items
+    ahead, so the next partition downloads while the current one is being decoded.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    abandoned = threading.Event()
+
+    def put(item):
+        while not abandoned.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_FETCH_DONE, e))
+        else:
+            put((_FETCH_DONE, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _FETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        abandoned.set()  # Let the producer exit if the consumer stops early
+
+
+def _gather_per_location(tile_ids: np.ndarray, index_lists: list) -> list:
+    """
+    Resolve every list of tile indexes in index_lists against tile_ids with a single
+    gather: the lists are flattened CSR-style, indexed together and split back.
+    """
+    if not index_lists:
+        return []
+    lengths = np.fromiter(map(len, index_lists), dtype=np.intp, count=len(index_lists))
+    flat_indexes = np.fromiter(
+        itertools.chain.from_iterable(index_lists), dtype=np.intp, count=int(lengths.sum())
+    )
+    return [
+        partition_ids.tolist()
+        for partition_ids in np.split(tile_ids[flat_indexes], np.cumsum(lengths)[:-1])
+    ]
+
+
+def _parse_partition_versions(payload: bytes) -> dict:
+    """Return {partition ID (str): version} from the JSON output of 'olp ... partition list --json'."""
+    items = _json_loads(payload).get('results', {}).get('items', [])
+    # extract version suffix after the last '.'
+    return {str(item['partition']): int(item['dataHandle'].split('.')[-1]) for item in items}
+
+
+def _olp_executable() -> str:
+    # On Windows the OLP CLI is olp.cmd, which CreateProcess only finds by its full path
+    return shutil.which('olp') or 'olp'
+
+
+@functools.lru_cache(maxsize=None)
+def get_platform() -> Platform:
+    """
+    Return the process-wide Platform, so every downloader shares one
+    authenticated SDK session and its HTTP connection pool.
+    """
+    return Platform()
+
+
+@functools.lru_cache(maxsize=8)
+def get_catalog(hrn: str) -> Catalog:
+    """Return the catalog for hrn, looked up once per process."""
+    return get_platform().get_catalog(hrn=hrn)
+
+
+def _json_loads(data: bytes):
+    """Parse UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return _JSON_DECODE(data.decode("utf-8"))
+
+
+def _json_dump(obj, output) -> None:
+    """Write obj to the binary file object output as indented UTF-8 JSON."""
+    if orjson is not None:
+        output.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    # json.dump encodes chunk by chunk, so the whole document is never held as one str
+    text_output = io.TextIOWrapper(output, encoding="utf-8")
+    json.dump(obj, text_output, indent=2, ensure_ascii=False)
+    text_output.flush()
+    text_output.detach()
+
+
+def _json_dumps(obj) -> str:
+    """Return obj as indented JSON text, for logging."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def _text_dump(message, output) -> None:
+    """Write message to the binary file object output in protobuf text format, as str(message) would."""
+    # PrintMessage writes field by field, so the whole text is never held as one str
+    text_output = io.TextIOWrapper(output, encoding="utf-8")
+    text_format.PrintMessage(message, text_output)
+    text_output.flush()
+    text_output.detach()
+
 
 class HmcDownloader:
     """
@@ -27,6 +216,7 @@ class HmcDownloader:
     - `version`: The version of partition should be downloaded.
     - `quad_ids`: A list of quad IDs to be downloaded.
     - `file_format`: The file format to be used for the downloaded data.
+    - `max_workers`: The number of threads that decode and write partitions concurrently.
     - `tiling_scheme`: The tiling scheme to be used for the downloaded data.
     - `output_file_path`: The path to the output file.
 
@@ -34,12 +224,14 @@ class HmcDownloader:
     - `get_output_file_path()`: Returns the path to the output file.
     - `set_tiling_scheme(tiling_scheme: str)`: Sets the tiling scheme to be used for the downloaded data.
     - `get_schema()`: Retrieves the schema for the specified layer.
-    - `partition_file_writer(partition: Partition)`: Writes the downloaded data to a file.
-    - `download_generic_layer()`: Downloads the data for the specified layer using the generic tiling scheme.
-    - `download_generic_layer(quad_ids: list)`: Downloads the data for the specified layer and quad IDs using the generic tiling scheme.
-    - `download_partitioned_layer(quad_ids: list)`: Downloads the data for the specified layer and quad IDs using the partitioned tiling scheme.
-    - `get_country_tile_indexes(iso_country_code_tuple: tuple)`: Retrieves the country tile indexes for the specified ISO country codes.
-    - `get_country_admin_indexes(iso_country_code_tuple: tuple)`: Retrieves the country admin indexes for the specified ISO country codes.
+    - `partition_file_writer(partition: Partition)`: Writes the downloaded data to a file and returns its path.
+    - `download_generic_layer(quad_ids: list = None, version: int = None)`: Downloads the data for the specified layer using the generic tiling scheme, either every partition or only the given quad IDs.
+    - `clear_partition_version_cache()`: Forgets the partition versions listed with the OLP CLI so far in this process.
+    - `get_downloaded_partition_ids(tiling_scheme: str, quad_ids: list, olp_cli: bool = False)`: Returns the quad IDs of this layer whose output file of the current partition version is already on disk.
+    - `download_partitioned_layer(quad_ids: list, concurrency: int)`: Downloads the data for the specified layer and quad IDs using the partitioned tiling scheme, fetching up to `concurrency` chunks of quad IDs in parallel.
+    - `get_country_tile_indexes(iso_country_code_tuple: tuple, version: int)`: Retrieves the country tile indexes for the specified ISO country codes.
+    - `get_country_admin_indexes(iso_country_code_tuple: tuple, verbose: bool = False)`: Retrieves the country admin indexes for the specified ISO country codes, printing each resolved partition when verbose is set.
+    Both country index methods remember their results for the rest of the process; repeated calls with the same countries return the same list.
     """
 
     catalog: Catalog
@@ -51,122 +243,148 @@ class HmcDownloader:
     output_file_path: str
     partition_data: None
 
-    def __init__(self, catalog: Catalog, layer: str, file_format: FileFormat, version: int = None) -> None:
+    def __init__(self, catalog: Catalog, layer: str, file_format: FileFormat, version: int = None,
+                 max_workers: Optional[int] = None) -> None:
         super().__init__()  # Initialize the class with the provided catalog, layer, and file format
         self.catalog = catalog
         self.layer = layer
         self.file_format = file_format
         self.version = version
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._output_file_path_lock = threading.Lock()
+        self._metadata_lock = threading.Lock()
+        self._layer = None
+        self._schema = None
+        self._extension = _FILE_EXTENSIONS[file_format]  # Output file extension, looked up once
+        self._file_name_prefix = f"{layer}_"  # Output file names start with '<layer>_<partition ID>'
+        self._hrn_folder = catalog.hrn.replace(":", "_")  # Replace ':' with '_' in the catalog HRN
+        self._existing_files = {}  # Partition directory -> names of the files already in it
+        self._existing_files_lock = threading.Lock()
+        self.tiling_scheme = None
+        self._base_dir = None  # Directory that holds one folder per partition, set by set_tiling_scheme()
 
     def get_output_file_path(self):
         return self.output_file_path
 
     def set_tiling_scheme(self, tiling_scheme: str):
         self.tiling_scheme = tiling_scheme
+        self._base_dir = os.path.join("decoded", self._hrn_folder, tiling_scheme)
         return self
 
+    def _partition_dir(self, partition_id) -> str:
+        if self._base_dir is None:
+            raise ValueError("No tiling scheme set, call set_tiling_scheme() first")
+        return os.path.join(self._base_dir, str(partition_id))
+
     def get_partition_data(self):
         return self.partition_data
 
+    def _get_layer(self):
+        if self._layer is None:
+            with self._metadata_lock:  # Threads sharing this downloader resolve the layer only once
+                if self._layer is None:
+                    self._layer = self.catalog.get_layer(
+                        self.layer
+                    )  # Resolve the layer from the catalog only once
+        return self._layer
+
     def get_schema(self):
-        return self.catalog.get_layer(
-            self.layer
-        ).get_schema()  # Retrieve the schema for the specified layer
+        if self._schema is None:
+            layer = self._get_layer()
+            with self._metadata_lock:
+                if self._schema is None:
+                    self._schema = (
+                        layer.get_schema()
+                    )  # Retrieve the schema for the specified layer
+        return self._schema
 
-    def partition_file_writer(self, partition: Partition):
+    def _existing_file_names(self, partition_dir: str) -> set:
+        """
+        Return the names of the files in partition_dir, listing the directory only on first use.
+        """
+        with self._existing_files_lock:
+            names = self._existing_files.get(partition_dir)
+            if names is None:
+                try:
+                    with os.scandir(partition_dir) as entries:
+                        names = {entry.name for entry in entries if entry.is_file()}
+                except FileNotFoundError:
+                    names = set()
+                self._existing_files[partition_dir] = names
+            return names
+
+    def _set_output_file_path(self, filename: str) -> str:
+        with self._output_file_path_lock:
+            self.output_file_path = filename
+        return filename
+
+    def partition_file_writer(self, partition: Partition) -> str:
+        """
+        Write one (versioned partition, content) pair to its output file and return the file path,
+        whether the file was created now or already existed.
+        """
         versioned_partition, partition_content = (
             partition  # Unpack the versioned partition and partition content
         )
-        hrn_folder_name = self.catalog.hrn.replace(
-            ":", "_"
-        )  # Replace ':' with '_' in the catalog HRN
-        extension: str
-        if (
-                self.file_format == FileFormat.TXTBP
-        ):  # Check the file format and set the extension accordingly
-            extension = "txtbp"
-        elif self.file_format == FileFormat.JSON:
-            extension = "json"
-        filename = os.path.join(
-            "decoded",
-            hrn_folder_name,
-            self.tiling_scheme,
-            str(versioned_partition.id),
-            # Construct the filename
-            "{}_{}_v{}.{}".format(
-                self.layer,
-                versioned_partition.id,
-                versioned_partition.version,
-                extension,
-            ),
-        )
-        if not os.path.exists(filename):  # Check if the file already exists
-            if not os.path.exists(
-                    "decoded"
-            ):  # Create 'decoded' directory if it doesn't exist
-                os.mkdir("decoded")
-            if not os.path.exists(
-                    os.path.join("decoded", hrn_folder_name)
-            ):  # Create HRN directory if it doesn't exist
-                os.mkdir(os.path.join("decoded", hrn_folder_name))
-            if not os.path.exists(
-                    os.path.join("decoded", hrn_folder_name, self.tiling_scheme)
-            ):  # Create HRN directory if it doesn't exist
-                os.mkdir(os.path.join("decoded", hrn_folder_name, self.tiling_scheme))
-            if not os.path.exists(
-                    os.path.join(
-                        "decoded",
-                        hrn_folder_name,
-                        self.tiling_scheme,
-                        str(versioned_partition.id),
-                    )
-            ):  # Create partition directory if it doesn't exist
-                os.mkdir(
-                    os.path.join(
-                        "decoded",
-                        hrn_folder_name,
-                        self.tiling_scheme,
-                        str(versioned_partition.id),
-                    )
-                )
-            print(
-                "layer: {} | partition: {} | version: {} | size: {} bytes".format(
-                    self.layer,
-                    # Print information about the layer, partition, version, and size
-                    versioned_partition.id,
-                    versioned_partition.version,
-                    versioned_partition.data_size,
-                )
-            )
-            decoded_content = DecodedMessage(
-                partition_content
-            )  # Decode the partition content
-            with open(
-                    filename, mode="w", encoding="utf-8"
-            ) as output:  # Open the file for writing
-                content_to_write: str
-                if (
-                        self.file_format == FileFormat.TXTBP
-                ):  # Check the file format and set the content to write accordingly
-                    content_to_write = str(decoded_content)
-                elif self.file_format == FileFormat.JSON:
-                    content_to_write = MessageToJson(decoded_content)
-                output.write(content_to_write)  # Write the content to the file
-                print({"filename": filename, "result": "created"})
-                self.output_file_path = filename
+        partition_dir = self._partition_dir(versioned_partition.id)
+        basename = (
+            f"{self._file_name_prefix}{versioned_partition.id}_v{versioned_partition.version}.{self._extension}"
+        )  # Construct the filename
+        filename = os.path.join(partition_dir, basename)
+        if basename in self._existing_file_names(partition_dir):
+            _print({"filename": filename, "result": "skipped"})
+            return self._set_output_file_path(filename)
+        os.makedirs(
+            partition_dir, exist_ok=True
+        )  # Create the partition directory and its parents if they don't exist
+        try:
+            output = open(
+                filename, mode="xb", buffering=_WRITE_BUFFER_SIZE
+            )  # Create the file for writing, failing if it already exists
+        except FileExistsError:
+            _print({"filename": filename, "result": "skipped"})
         else:
-            print({"filename": filename, "result": "skipped"})
-            self.output_file_path = filename
-
-    def download_generic_layer(self):
-        self.set_tiling_scheme("generic")
-        generic_layer = self.catalog.get_layer(
-            self.layer
-        )  # Get the versioned layer for the specified layer
-        if generic_layer.get_schema():
-            partitions = generic_layer.read_partitions()
-            for p in partitions:
-                self.partition_file_writer(p)
+            with output:
+                try:
+                    _print(
+                        "layer: {} | partition: {} | version: {} | size: {} bytes".format(
+                            self.layer,
+                            # Print information about the layer, partition, version, and size
+                            versioned_partition.id,
+                            versioned_partition.version,
+                            versioned_partition.data_size,
+                        )
+                    )
+                    if self.file_format == FileFormat.PROTOBUF:
+                        # The payload is already in wire format, so it is written without decoding
+                        output.write(
+                            partition_content
+                            if isinstance(partition_content, bytes)
+                            else partition_content.SerializeToString()
+                        )
+                    else:
+                        decoded_content = DecodedMessage(
+                            partition_content
+                        )  # Decode the partition content
+                        if (
+                                self.file_format == FileFormat.TXTBP
+                        ):  # Check the file format and write the content accordingly
+                            _text_dump(decoded_content, output)
+                        elif self.file_format == FileFormat.JSON:
+                            _json_dump(MessageToDict(decoded_content), output)
+                        elif self.file_format == FileFormat.JSON_GZIP:
+                            with gzip.GzipFile(
+                                    fileobj=output, mode="wb", compresslevel=_GZIP_COMPRESS_LEVEL
+                            ) as compressed_output:
+                                _json_dump(MessageToDict(decoded_content), compressed_output)
+                except BaseException:
+                    output.close()
+                    os.remove(filename)  # Don't leave a partial file that later runs would skip
+                    raise
+            with self._existing_files_lock:
+                self._existing_files[partition_dir].add(basename)
+            _print({"filename": filename, "result": "created"})
+        return self._set_output_file_path(filename)
 
     def olp_cli_download_partition(
             self,
@@ -174,184 +392,392 @@ class HmcDownloader:
             quad_ids: List[int],
             write_to_file: bool = True,
             version: Optional[int] = None,
+            max_processes: int = 4,
     ):
         """
+        1. If version is None, call 'olp catalog layer partition list ... --json' for each
+           batch of partition IDs and parse out each version from its dataHandle.
         For each partition ID in quad_ids:
-          1. If version is None, call 'olp catalog layer partition list ... --json'
-             and parse out the version from dataHandle.
           2. Build the 'olp catalog layer partition get' command with that version.
-          3. Redirect its output into the path returned by get_output_filepath().
+          3. Stream its output into the path returned by get_output_filepath().
+
+        The list and get commands run as asyncio subprocesses, up to `max_processes` at a
+        time, and the downloads of a batch start as soon as its versions are listed, while
+        the next batch is still being listed.
         """
         self.set_tiling_scheme(tiling_scheme)
-        for partition_id in quad_ids:
+        found = asyncio.run(self._olp_cli_download(list(quad_ids), write_to_file, version, max_processes))
+        if not found:
+            raise RuntimeError(f"No partition info found for {list(quad_ids)}")
+
+    async def _olp_cli_download(self, quad_ids: list, write_to_file: bool, version: Optional[int],
+                                max_processes: int) -> int:
+        """
+        Run the list and get commands of olp_cli_download_partition(), raise the first failure
+        once all of them have finished, and return the number of partitions found.
+
+        Get commands go through a bounded queue to `max_processes` worker coroutines, so the
+        number of pending downloads held at once does not grow with the number of partitions.
+        """
+        olp = _olp_executable()
+        semaphore = asyncio.Semaphore(max_processes)
+        get_queue = asyncio.Queue(maxsize=max_processes * 2)  # (get command, partition ID, version)
+        errors = []
+        found = 0
+
+        async def download_worker():
+            while True:
+                item = await get_queue.get()
+                if item is None:
+                    return
+                get_cmd, partition_id, ver = item
+                try:
+                    # 3a. Decide output path
+                    output_file = self.get_output_filepath(partition_id, ver)
+                    async with semaphore:
+                        # 3b. Connect the command's stdout to the output file directly, without a shell.
+                        # olp writes to the file descriptor itself, so no Python-side buffer is needed
+                        with open(output_file, 'wb', buffering=0) as output:
+                            process = await asyncio.create_subprocess_exec(*get_cmd, stdout=output)
+                        returncode = await process.wait()
+                    if returncode:
+                        os.remove(output_file)  # Don't leave a partial file that later runs would skip
+                        raise subprocess.CalledProcessError(returncode, get_cmd)
+                except Exception as e:
+                    errors.append(e)  # Keep draining the queue so the producers never block
+                    continue
+                _print(f"Written: {output_file} (return code: {returncode})")
+                self._set_output_file_path(output_file)
+                with self._existing_files_lock:
+                    names = self._existing_files.get(os.path.dirname(output_file))
+                    if names is not None:  # Keep an already listed directory up to date
+                        names.add(os.path.basename(output_file))
+
+        async def start_downloads(partition_ids, partition_versions):
+            nonlocal found
+            for partition_id in partition_ids:
+                ver = partition_versions.get(str(partition_id))
+                if ver is None:
+                    _print(f"No partition info found for {partition_id}, skipped")
+                    continue
+                found += 1
+
+                # 2. Build the get command
+                get_cmd = [
+                    olp, 'catalog', 'layer', 'partition', 'get',
+                    self.catalog.hrn, self.layer,
+                    '--partitions', str(partition_id),
+                    '--version', str(ver),
+                    '--decode', 'true'
+                ]
+
+                _print(' '.join(get_cmd))
+
+                if write_to_file:
+                    await get_queue.put((get_cmd, partition_id, ver))  # Wait while the workers are busy
+
+        async def list_batch(partition_ids, partition_versions):
+            partition_versions.update(await self._olp_cli_list_versions(olp, partition_ids, semaphore))
+            await start_downloads(partition_ids, partition_versions)
+
+        workers = [asyncio.ensure_future(download_worker()) for _ in range(max_processes)]
+        try:
             # 1. Determine which version to fetch
             if version is None:
-                list_cmd = [
-                    'olp', 'catalog', 'layer', 'partition', 'list',
-                    self.catalog.hrn, self.layer,
-                    '--filter', str(partition_id),
-                    '--json'
+                partition_versions = _partition_version_cache.setdefault((self.catalog.hrn, self.layer), {})
+                unlisted_ids = [
+                    partition_id for partition_id in quad_ids if str(partition_id) not in partition_versions
                 ]
-                # run the list command and parse JSON
-                res = subprocess.run(
-                    list_cmd,
-                    capture_output=True,
-                    shell=True,
-                    check=True
+                results = await asyncio.gather(
+                    start_downloads(
+                        [partition_id for partition_id in quad_ids if str(partition_id) in partition_versions],
+                        partition_versions,
+                    ),  # Versions listed by an earlier call need no list command
+                    *(
+                        list_batch(unlisted_ids[start:start + _OLP_FILTER_BATCH_SIZE], partition_versions)
+                        for start in range(0, len(unlisted_ids), _OLP_FILTER_BATCH_SIZE)
+                    ),
+                    return_exceptions=True,
                 )
-                payload = json.loads(res.stdout)
-                items = payload.get('results', {}).get('items', [])
-                if not items:
-                    raise RuntimeError(f"No partition info found for {partition_id}")
-                data_handle = items[0]['dataHandle']
-                # extract version suffix after the last '.'
-                ver = int(data_handle.split('.')[-1])
+                errors.extend(result for result in results if isinstance(result, BaseException))
             else:
-                ver = version
-
-            # 2. Build the get command
-            get_cmd = [
-                'olp', 'catalog', 'layer', 'partition', 'get',
-                self.catalog.hrn, self.layer,
-                '--partitions', str(partition_id),
-                '--version', str(ver),
-                '--decode', 'true'
-            ]
-
-            print(' '.join(get_cmd))
-
-            if write_to_file:
-                # 3a. Decide output path
-                output_file = self.get_output_filepath(partition_id, ver)
-                # 3b. Add shell redirection
-                full_cmd = ' '.join(get_cmd) + f' > "{output_file}"'
-                # 3c. Execute
-                result = subprocess.run(
-                    full_cmd,
-                    shell=True,
-                    check=True
-                )
-                print(f"Written: {output_file} (return code: {result.returncode})")
-                self.output_file_path = output_file
+                await start_downloads(quad_ids, {str(partition_id): version for partition_id in quad_ids})
+        finally:
+            for _ in workers:
+                await get_queue.put(None)
+            await asyncio.gather(*workers)
+        if errors:
+            raise errors[0]
+        return found
+
+    def _olp_cli_list_cmd(self, olp: str, partition_ids: list) -> list:
+        return [
+            olp, 'catalog', 'layer', 'partition', 'list',
+            self.catalog.hrn, self.layer,
+            '--filter', *[str(partition_id) for partition_id in partition_ids],
+            '--json'
+        ]
+
+    async def _olp_cli_list_versions(self, olp: str, partition_ids: list, semaphore: asyncio.Semaphore) -> dict:
+        """Return {partition ID (str): version} of partition_ids from one 'olp ... partition list' call."""
+        list_cmd = self._olp_cli_list_cmd(olp, partition_ids)
+        async with semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *list_cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            stdout, _ = await process.communicate()
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, list_cmd)
+        return _parse_partition_versions(stdout)
+
+    def _olp_cli_partition_versions(self, partition_ids: list, max_processes: int = 4) -> dict:
+        """
+        Return {partition ID (str): version} for this layer, listing the partition_ids that are
+        not in _partition_version_cache yet with the OLP CLI first.
+        """
+        partition_versions = _partition_version_cache.setdefault((self.catalog.hrn, self.layer), {})
+        unlisted_ids = [partition_id for partition_id in partition_ids if str(partition_id) not in partition_versions]
+
+        async def list_all():
+            olp = _olp_executable()
+            semaphore = asyncio.Semaphore(max_processes)
+            for listed_versions in await asyncio.gather(*(
+                    self._olp_cli_list_versions(olp, unlisted_ids[start:start + _OLP_FILTER_BATCH_SIZE], semaphore)
+                    for start in range(0, len(unlisted_ids), _OLP_FILTER_BATCH_SIZE)
+            )):
+                partition_versions.update(listed_versions)
+
+        if unlisted_ids:
+            asyncio.run(list_all())
+        return partition_versions
+
+    @staticmethod
+    def clear_partition_version_cache():
+        """
+        Forget the partition versions listed with the OLP CLI so far, e.g. when a long-running
+        process should pick up a newer catalog version.
+        """
+        _partition_version_cache.clear()
+
+    def _sdk_partition_versions(self, partition_ids: list) -> dict:
+        """
+        Return {partition ID (str): version} of partition_ids in the catalog version of this
+        downloader, as read_partitions() would fetch them.
+        """
+        layer = self._get_layer()
+        partition_versions = {}
+        for start in range(0, len(partition_ids), _METADATA_BATCH_SIZE):
+            for versioned_partition in layer.get_partitions_metadata(
+                    partition_ids=partition_ids[start:start + _METADATA_BATCH_SIZE], version=self.version
+            ):
+                partition_versions[str(versioned_partition.id)] = versioned_partition.version
+        return partition_versions
 
-    def download_generic_layer(self, quad_ids: list, version: int):
+    def download_generic_layer(self, quad_ids: Optional[list] = None, version: Optional[int] = None):
         self.set_tiling_scheme("generic")
-        versioned_layer = self.catalog.get_layer(
-            self.layer
-        )  # Get the versioned layer for the specified layer
-        partitions = versioned_layer.read_partitions(
-            quad_ids, version
-        )  # Read partitions for the specified quad IDs
-        for p in partitions:
-            self.partition_file_writer(p)
+        generic_layer = self._get_layer()  # Get the versioned layer for the specified layer
+        if quad_ids is None:
+            if self.get_schema():
+                self._write_partitions([generic_layer.read_partitions])  # Read every partition of the layer
+        else:
+            self._write_partitions(
+                [functools.partial(generic_layer.read_partitions, quad_ids, version)]
+            )  # Read partitions for the specified quad IDs
 
     def get_output_filepath(self, partition_id: int, version: Optional[int]) -> str:
         """
         Determine the output path for a given partition and version,
         create directories if necessary, and return the full file path.
         """
-        hrn_folder = self.catalog.hrn.replace(':', '_')
-        base_dir = os.path.join(
-            'decoded',
-            hrn_folder,
-            self.tiling_scheme,
-            str(partition_id)
-        )
+        base_dir = self._partition_dir(partition_id)
         os.makedirs(base_dir, exist_ok=True)
 
-        filename = f"{self.layer}_{partition_id}"
+        filename = f"{self._file_name_prefix}{partition_id}"
         if version is not None:
             filename += f"_v{version}_olpcli"
         filename += ".json"
 
         return os.path.join(base_dir, filename)
 
-    def download_partitioned_layer(self, quad_ids: list, write_to_file: bool = True, version: int = None):
+    def get_downloaded_partition_ids(self, tiling_scheme: str, quad_ids: list, olp_cli: bool = False) -> set:
+        """
+        Return the subset of quad_ids whose output file for this layer is already on disk in the
+        format and partition version that would be written now: '<layer>_<id>_v<version>.<file_format
+        extension>' from partition_file_writer(), or '<layer>_<id>_v<version>_olpcli.json' from
+        olp_cli_download_partition() when olp_cli is set.
+        The partition versions are listed from the platform, only for the quad IDs that have a file
+        of this layer and format at all; a file of another partition version doesn't count, so
+        partitions changed since the last run are downloaded again. OLP CLI files of a pinned
+        catalog version are named after that version, as olp_cli_download_partition() writes them.
+        """
+        base_dir = os.path.join('decoded', self._hrn_folder, tiling_scheme)
+        suffix = "_olpcli.json" if olp_cli else f".{self._extension}"
+        candidates = {}  # Partition ID -> (file name prefix, names of the files in its directory)
+        for partition_id in quad_ids:
+            prefix = f"{self._file_name_prefix}{partition_id}_v"
+            names = self._existing_file_names(os.path.join(base_dir, str(partition_id)))
+            if any(name.startswith(prefix) and name.endswith(suffix) for name in names):
+                candidates[partition_id] = (prefix, names)
+        if not candidates:
+            return set()  # Nothing on disk, so no versions need to be listed
+        if olp_cli and self.version is not None:
+            partition_versions = {str(partition_id): self.version for partition_id in candidates}
+        elif olp_cli:
+            partition_versions = self._olp_cli_partition_versions(list(candidates))
+        else:
+            partition_versions = self._sdk_partition_versions(list(candidates))
+        downloaded = set()
+        for partition_id, (prefix, names) in candidates.items():
+            version = partition_versions.get(str(partition_id))
+            if version is not None and f"{prefix}{version}{suffix}" in names:
+                downloaded.add(partition_id)
+        return downloaded
+
+    def download_partitioned_layer(self, quad_ids: list, write_to_file: bool = True, version: int = None,
+                                   concurrency: int = 64):
         self.set_tiling_scheme("heretile")
-        versioned_layer = self.catalog.get_layer(
-            self.layer
-        )  # Get the versioned layer for the specified layer
-        partitions = versioned_layer.read_partitions(
-            quad_ids, version
-        )  # Read partitions for the specified quad IDs
+        versioned_layer = self._get_layer()  # Get the versioned layer for the specified layer
         if write_to_file:
-            for p in partitions:
-                self.partition_file_writer(p)
+            self._download_partitions_concurrently(versioned_layer, list(quad_ids), version, concurrency)
         else:
-            self.partition_data = partitions
+            self.partition_data = versioned_layer.read_partitions(
+                quad_ids, version
+            )  # Read partitions for the specified quad IDs
         return self
 
-    def get_country_tile_indexes(self, iso_country_code_tuple: tuple):
-        layer = self.catalog.get_layer(
-            self.layer
-        )  # Get the layer for the specified layer
-        partitions = layer.read_partitions(
-            iso_country_code_tuple
-        )  # Read partitions for the specified ISO country code tuple
+    def _download_partitions_concurrently(self, versioned_layer, quad_ids: list, version: Optional[int],
+                                          concurrency: int):
+        """
+        Split quad_ids into at most `concurrency` chunks and read each chunk from the
+        platform in its own thread.
+        """
+        if not quad_ids:
+            return
+        concurrency = max(1, min(concurrency, len(quad_ids)))
+        chunk_size = math.ceil(len(quad_ids) / concurrency)
+        self._write_partitions([
+            functools.partial(versioned_layer.read_partitions, quad_ids[i:i + chunk_size], version)
+            for i in range(0, len(quad_ids), chunk_size)
+        ])
+
+    def _write_partitions(self, partition_readers: list):
+        """
+        Call each partition reader in its own fetch thread and hand the partitions it
+        yields to up to `max_workers` writer threads through a bounded queue, so network
+        fetches overlap with decoding and file writes while the number of partitions
+        held in memory stays capped.
+        """
+        writer_count = max(1, self.max_workers)
+        partition_queue = queue.Queue(maxsize=max(len(partition_readers), writer_count) * 2)
+        stop = threading.Event()
+
+        def fetch(read_partitions):
+            for p in read_partitions():
+                if stop.is_set():
+                    break
+                partition_queue.put(p)
+
+        def write():
+            error = None
+            while True:
+                p = partition_queue.get()
+                if p is _FETCH_DONE:
+                    if error is not None:
+                        raise error
+                    return
+                if stop.is_set():
+                    continue  # Keep draining so fetch threads never block on a full queue
+                try:
+                    self.partition_file_writer(p)
+                except Exception as e:
+                    error = e
+                    stop.set()
+
+        with ThreadPoolExecutor(max_workers=len(partition_readers) + writer_count) as executor:
+            writers = [executor.submit(write) for _ in range(writer_count)]
+            fetchers = [executor.submit(fetch, reader) for reader in partition_readers]
+            try:
+                done, _ = wait(fetchers, return_when=FIRST_EXCEPTION)
+                if any(f.exception() is not None for f in done):
+                    stop.set()  # Let the remaining fetch threads give up early
+                wait(fetchers)
+            except BaseException:
+                stop.set()
+                raise
+            finally:
+                for _ in writers:
+                    partition_queue.put(_FETCH_DONE)
+            for f in fetchers + writers:
+                f.result()  # Re-raise errors from the fetch and writer threads
+
+    def get_country_tile_indexes(self, iso_country_code_tuple: tuple, version: Optional[int] = None):
+        cache_key = (self.catalog.hrn, self.layer, "tile", tuple(iso_country_code_tuple), version)
+        if cache_key in _country_index_cache:
+            return _country_index_cache[cache_key]  # Reuse the results of an earlier call
+        layer = self._get_layer()  # Get the layer for the specified layer
+        partitions = _prefetch(layer.read_partitions(
+            iso_country_code_tuple, version
+        ))  # Read partitions for the specified ISO country code tuple
         results = []
         for p in partitions:
             versioned_partition, partition_content = (
                 p  # Unpack the versioned partition and partition content
             )
-            decoded_content_json = json.loads(
-                MessageToJson(DecodedMessage(partition_content))
-            )  # Decode the partition content to JSON
+            decoded_content = DecodedMessage(
+                partition_content
+            )  # Decode the partition content
             results.append(
-                {decoded_content_json["partitionName"]: decoded_content_json["tileId"]}
+                {decoded_content.partition_name: list(decoded_content.tile_id)}
             )  # Append partition name and tile ID to results
+        _country_index_cache[cache_key] = results
         return results  # Return the results
 
-    def get_country_admin_indexes(self, iso_country_code_tuple: tuple):
-        layer = self.catalog.get_layer(
-            self.layer
-        )  # Get the layer for the specified layer
-        partitions = layer.read_partitions(
+    def get_country_admin_indexes(self, iso_country_code_tuple: tuple, verbose: bool = False):
+        cache_key = (self.catalog.hrn, self.layer, "admin", tuple(iso_country_code_tuple), None)
+        if cache_key in _country_index_cache:
+            return _country_index_cache[cache_key]  # Reuse the results of an earlier call
+        layer = self._get_layer()  # Get the layer for the specified layer
+        partitions = _prefetch(layer.read_partitions(
             iso_country_code_tuple
-        )  # Read partitions for the specified ISO country code tuple
+        ))  # Read partitions for the specified ISO country code tuple
         results = []
         for p in partitions:
             versioned_partition, partition_content = (
                 p  # Unpack the versioned partition and partition content
             )
-            hmc_json = json.loads(
-                MessageToJson(DecodedMessage(partition_content))
-            )  # Decode the partition content to JSON
-            tile_id_list = hmc_json["tileId"]  # Get the tile ID list from the JSON
-            indexed_location_list = hmc_json[
-                "indexedLocation"
-            ]  # Get the indexed location list from the JSON
-            for indexed_location in indexed_location_list:
-                indexed_location_tile_index_list = indexed_location[
-                    "tileIndex"
-                ]  # Get the tile index list from the indexed location
-                indexed_location_boundary_tile_index_list = indexed_location[
-                    "boundaryTileIndex"
-                ]  # Get the boundary tile index list from the indexed location
-                del indexed_location[
-                    "tileIndex"
-                ]  # Delete the tile index from the indexed location
-                del indexed_location[
-                    "boundaryTileIndex"
-                ]  # Delete the boundary tile index from the indexed location
-                indexed_location["partitionIdList"] = (
-                    []
-                )  # Initialize the partition ID list in the indexed location
-                indexed_location["boundaryPartitionIdList"] = (
-                    []
-                )  # Initialize the boundary partition ID list in the indexed location
-                for indexed_location_tile_index in indexed_location_tile_index_list:
-                    indexed_location["partitionIdList"].append(
-                        tile_id_list[indexed_location_tile_index]
-                    )  # Append partition ID to the partition ID list
-                for (
-                        indexed_location_boundary_tile_index
-                ) in indexed_location_boundary_tile_index_list:
-                    indexed_location["boundaryPartitionIdList"].append(
-                        # Append boundary partition ID to the boundary partition ID list
-                        tile_id_list[indexed_location_boundary_tile_index]
-                    )
-            hmc_json["indexedLocation"] = (
-                indexed_location_list  # Update the indexed location list in the HMC JSON
-            )
-            print(json.dumps(hmc_json, indent="    "))  # Print the formatted HMC JSON
+            decoded_content = DecodedMessage(
+                partition_content
+            )  # Decode the partition content
+            hmc_json = MessageToDict(
+                decoded_content
+            )  # Convert the partition content to a dict once, without a JSON string in between
+            tile_ids = np.asarray(
+                decoded_content.tile_id, dtype=np.int64
+            )  # Read the tile ID list from the message field directly
+            indexed_locations = decoded_content.indexed_location
+            partition_id_lists = _gather_per_location(
+                tile_ids, [indexed_location.tile_index for indexed_location in indexed_locations]
+            )  # Resolve the tile indexes of all indexed locations to partition IDs at once
+            boundary_partition_id_lists = _gather_per_location(
+                tile_ids, [indexed_location.boundary_tile_index for indexed_location in indexed_locations]
+            )  # Resolve the boundary tile indexes of all indexed locations to partition IDs at once
+            for indexed_location_json, partition_id_list, boundary_partition_id_list in zip(
+                    hmc_json.get("indexedLocation", []), partition_id_lists, boundary_partition_id_lists
+            ):
+                indexed_location_json.pop(
+                    "tileIndex", None
+                )  # Delete the tile index from the indexed location
+                indexed_location_json.pop(
+                    "boundaryTileIndex", None
+                )  # Delete the boundary tile index from the indexed location
+                indexed_location_json["partitionIdList"] = partition_id_list
+                indexed_location_json["boundaryPartitionIdList"] = boundary_partition_id_list
+            if verbose:
+                _print(_json_dumps(hmc_json))  # Dump the formatted HMC JSON when asked to
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s", _json_dumps(hmc_json)
+                )  # Dump the formatted HMC JSON only when debug logging is on
+            results.append(hmc_json)  # Append the resolved partition to results
+        _country_index_cache[cache_key] = results
         return results  # Return the results
@@ -5,12 +5,11 @@ import re
 import geojson
 import shapely
 from shapely.ops import substring
-from here.platform import Platform
 from progressbar import ProgressBar
 
 import hmc_layer_cross_referencing
 from hmc_download_options import FileFormat
-from hmc_downloader import HmcDownloader
+from hmc_downloader import HmcDownloader, get_catalog, get_platform
 from hmc_topology_to_geojson import HmcTopologyToGeoJson
 
 
@@ -81,12 +80,12 @@ if __name__ == '__main__':
                         topology_geometry_reference_node_list = hmc_layer_cross_referencing.node_list_generator(r)
 
                         if not topology_geometry_reference_segment_list:
-                            platform = Platform()
+                            platform = get_platform()
                             env = platform.environment
                             config = platform.platform_config
                             print('Download topology-geometry layer from HERE Platform...')
                             print('HERE Platform Status: ', platform.get_status())
-                            platform_catalog = platform.get_catalog(hrn='hrn:here:data::olp-here:rib-2')
+                            platform_catalog = get_catalog('hrn:here:data::olp-here:rib-2')
                             hmc_downloader_output_file_path = HmcDownloader(catalog=platform_catalog,
                                                                             layer='topology-geometry',
                                                                             file_format=FileFormat.JSON, version=None).download_partitioned_layer(
@@ -113,7 +112,7 @@ if __name__ == '__main__':
 
                                 for segment_anchor in segment_anchor_with_attributes_list:
                                     segment_anchor['properties'] = {}
-                                for key in list(hmc_json.keys()):
+                                for key in hmc_json.keys():
                                     if isinstance(hmc_json[key], list):
                                         for hmc_json_element in hmc_json[key]:
                                             if hmc_json_element.get('segmentAnchorIndex'):
@@ -174,7 +173,7 @@ if __name__ == '__main__':
                                                                        prefix='{} - processing nodes:'.format(f))
                                 # for node_anchor in node_anchor_with_attributes_list:
                                 #     node_anchor['properties'] = {}
-                                for key in list(hmc_json.keys()):
+                                for key in hmc_json.keys():
                                     if isinstance(hmc_json[key], list):
                                         for hmc_json_element in hmc_json[key]:
                                             if hmc_json_element.get('nodeAnchorIndex'):
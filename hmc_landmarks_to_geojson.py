@@ -42,7 +42,7 @@ if __name__ == '__main__':
                                                                                       landmark['anchorPoint']['latitude']]
                                     landmark_feature.geometry.coordinates = landmark_feature_geometry_geometry_coordinates
                                     del landmark['anchorPoint']
-                                    for key in list(landmark.keys()):
+                                    for key in landmark.keys():
                                         landmark_feature.properties[key] = landmark[key]
                                     landmark_feature_list.append(landmark_feature)
                                 landmark_feature_collection = geojson.FeatureCollection(landmark_feature_list)
@@ -90,13 +90,13 @@ if __name__ == '__main__':
                                     lane_anchor_process_progressbar.finish()
 
                                     # lane attribute mapping
-                                    for key in list(hmc_json.keys()):
+                                    for key in hmc_json.keys():
                                         if len(hmc_json[key]) > 0:
                                             if isinstance(hmc_json[key], list) and hmc_json[key][0].get('laneIndex'):
                                                 topology_anchor_multi_attribute_mapping(lane_list, key, 'laneIndex')
 
                                     # segment lane mapping
-                                    for key in list(hmc_json.keys()):
+                                    for key in hmc_json.keys():
                                         if len(hmc_json[key]) > 0:
                                             if isinstance(hmc_json[key], list) and hmc_json[key][0].get(
                                                     'segmentAnchorIndex'):
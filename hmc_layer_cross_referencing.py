@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 import re
@@ -5,13 +6,18 @@ import re
 import geojson
 
 
-def geojson_file_reader(path, layer_name):
+def geojson_file_path(path, layer_name):
     file_path = ''
     for r, d, fs in os.walk(path):
         for f in fs:
             if re.match("{}_.*\.geojson$".format(layer_name), f):
                 file_path = os.path.join(path, f)
                 break
+    return file_path
+
+
+def geojson_file_reader(path, layer_name):
+    file_path = geojson_file_path(path, layer_name)
     if file_path != '':
         with open(file_path, 'r', encoding='utf-8') as attribute_reference_file:
             return geojson.loads(attribute_reference_file.read())
@@ -31,8 +37,25 @@ def json_file_reader(path, layer_name):
             return json.loads(attribute_reference_file.read())
 
 
+@functools.lru_cache(maxsize=4)
+def _read_geojson_file(file_path, modified_time):
+    # modified_time is only part of the cache key, so a file rewritten since the last read is parsed again
+    with open(file_path, 'r', encoding='utf-8') as attribute_reference_file:
+        return geojson.loads(attribute_reference_file.read())
+
+
+def cached_geojson_file_reader(path, layer_name):
+    # Like geojson_file_reader, but an unchanged file is parsed only once; the result is shared between callers
+    # and must not be modified
+    file_path = geojson_file_path(path, layer_name)
+    if file_path != '':
+        return _read_geojson_file(file_path, os.stat(file_path).st_mtime_ns)
+    else:
+        return None
+
+
 def segment_list_generator(partition_folder_path):
-    topology_geometry_reference_geojson = geojson_file_reader(partition_folder_path, 'topology-geometry')
+    topology_geometry_reference_geojson = cached_geojson_file_reader(partition_folder_path, 'topology-geometry')
     if topology_geometry_reference_geojson:
         for topology_geometry_reference_geojson_feature_list in topology_geometry_reference_geojson['features']:
             if topology_geometry_reference_geojson_feature_list['properties'][0]['featureType'] == 'segment':
@@ -42,7 +65,7 @@ def segment_list_generator(partition_folder_path):
 
 
 def node_list_generator(partition_folder_path):
-    topology_geometry_reference_geojson = geojson_file_reader(partition_folder_path, 'topology-geometry')
+    topology_geometry_reference_geojson = cached_geojson_file_reader(partition_folder_path, 'topology-geometry')
     if topology_geometry_reference_geojson:
         for topology_geometry_reference_geojson_feature_list in topology_geometry_reference_geojson['features']:
             if topology_geometry_reference_geojson_feature_list['properties'][0]['featureType'] == 'node':
@@ -1,71 +1,462 @@
+import functools
 import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import geojson
-import shapely
-from shapely.ops import substring
+import numpy as np
 from here.content.utils.hmc_external_references import HMCExternalReferences
 from here.content.utils.hmc_external_references import Ref
 from here.platform.adapter import Identifier
 from here.platform.adapter import Partition
-from here.platform import Platform
 from here.content.content import Content
 from here.content.hmc2.hmc import HMC
 from progressbar import ProgressBar
-from hmc_downloader import HmcDownloader
+from hmc_downloader import HmcDownloader, get_catalog, get_platform
 from hmc_download_options import FileFormat
 
 import hmc_layer_cross_referencing
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
 
-def topology_anchor_attribute_mapping(attribute_name, index_name):
-    attribute_list = hmc_json[attribute_name]
-    attribute_progressbar = ProgressBar(min_value=0, max_value=len(attribute_list),
-                                        prefix='{} - processing {}:'.format(f, attribute_name))
-    attribute_index = 0
+WRITE_BUFFER_SIZE = 1 << 20  # GeoJSON output is written one feature at a time; batch it into 1 MiB writes
 
-    if attribute_name == 'streetSection':
-        for street_section in attribute_list:
-            street_section_ref = street_section.get('streetSectionRef')
-            if street_section_ref:
-                street_section_partition_name = street_section_ref.get('partitionName')
-                if street_section_partition_name:
-                    street_section_ref_set.add(street_section_partition_name)
 
+def load_json(file_path):
+    with open(file_path, mode='rb') as json_file:
+        json_bytes = json_file.read()
+    if orjson is not None:
+        return orjson.loads(json_bytes)
+    return json.loads(json_bytes)
+
+
+def dumps_json(obj, pretty=False):
+    # Returns UTF-8 bytes; orjson encodes straight to bytes. Compact unless pretty is set
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None).encode('utf-8')
+
+
+class FeatureCollectionWriter:
+    # Writes a GeoJSON FeatureCollection to a binary file one feature per line, as the features are built,
+    # so they never have to be held in memory together
+    def __init__(self, output_file, pretty=False):
+        self.output_file = output_file
+        self.pretty = pretty
+        self.separator = b'\n'
+
+    def __enter__(self):
+        self.output_file.write(b'{"type": "FeatureCollection", "features": [')
+        return self
+
+    def write(self, feature):
+        self.output_file.write(self.separator)
+        self.output_file.write(dumps_json(feature, self.pretty))
+        self.separator = b',\n'
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.output_file.write(b'\n]}\n')
+
+
+def round_coordinates(coordinates):
+    # Rounds to 6 decimal places, the default precision of the geojson package the output used to be built with
+    return [[round(x, 6), round(y, 6)] for x, y in coordinates]
+
+
+def line_measures(coordinates):
+    # Returns the vertices of a line as an (n, 2) array and the distance of each vertex along the line,
+    # summed segment by segment in the same order as shapely/GEOS do
+    vertices = np.asarray(coordinates, dtype=np.float64)[:, :2]
+    deltas = np.diff(vertices, axis=0)
+    segment_lengths = np.sqrt(deltas[:, 0] * deltas[:, 0] + deltas[:, 1] * deltas[:, 1])
+    return vertices, np.concatenate(([0.0], np.cumsum(segment_lengths)))
+
+
+def line_interpolate(vertices, vertex_distances, distance):
+    # Point at distance along the line, as shapely's LineString.interpolate for 0 <= distance
+    if distance >= vertex_distances[-1]:
+        return vertices[-1]
+    i = max(int(np.searchsorted(vertex_distances, distance, side='right')) - 1, 0)
+    segment_length = vertex_distances[i + 1] - vertex_distances[i]
+    if segment_length == 0:
+        return vertices[i]
+    return vertices[i] + (distance - vertex_distances[i]) / segment_length * (vertices[i + 1] - vertices[i])
+
+
+def line_substring(vertices, vertex_distances, start_dist, end_dist):
+    # Coordinates of the part of the line between two distances, as shapely.ops.substring for distances within
+    # the line: a single point if they are equal, reversed if start_dist is beyond end_dist
+    start_point = line_interpolate(vertices, vertex_distances, start_dist)
+    if start_dist == end_dist:
+        return [start_point.tolist()]
+    end_point = line_interpolate(vertices, vertex_distances, end_dist)
+    low_dist, high_dist = min(start_dist, end_dist), max(start_dist, end_dist)
+    inner_distances = vertex_distances[:-1]  # The last vertex is never strictly before the end of the line
+    inner_vertices = vertices[:-1][(inner_distances > low_dist) & (inner_distances < high_dist)]
+    if start_dist > end_dist:
+        inner_vertices = inner_vertices[::-1]
+    return np.vstack((start_point, inner_vertices, end_point)).tolist()
+
+
+def line_full_coordinates(vertices, vertex_distances):
+    # Same result as line_substring(vertices, vertex_distances, 0, length) without interpolating: repeated
+    # vertices at either end of the line collapse into the first and last vertex
+    line_length = vertex_distances[-1]
+    if line_length == 0:
+        return [vertices[-1].tolist()]
+    inner_vertices = vertices[(vertex_distances > 0) & (vertex_distances < line_length)]
+    return np.vstack((vertices[0], inner_vertices, vertices[-1])).tolist()
+
+
+# 進度條每 1024 筆才更新一次，避免在迴圈中每筆都重繪
+PROGRESSBAR_UPDATE_MASK = 1023
+
+SEGMENT_ANCHOR_INDEX_NAMES = ('segmentAnchorIndex', 'originSegmentAnchorIndex', 'originatingSegmentAnchorIndex')
+
+
+def segment_anchor_index_name(attribute_list):
+    # 以第一個 attribute 判斷此 list 用哪個欄位參照 segment anchor
+    first_attribute = attribute_list[0]
+    if isinstance(first_attribute, dict):
+        for index_name in SEGMENT_ANCHOR_INDEX_NAMES:
+            if first_attribute.get(index_name):
+                return index_name
+    return None
+
+
+def node_anchor_index_name(attribute_list):
     for attribute in attribute_list:
-        attribute_progressbar.update(attribute_index)
-        index_value = attribute.get(index_name)
-        if index_value is not None:
-            del attribute[index_name]
+        if isinstance(attribute, dict) and attribute.get('nodeAnchorIndex'):
+            return 'nodeAnchorIndex'
+    return None
 
+
+# (圖層, 判斷函式, attribute 名稱) -> index 欄位；同一圖層的 schema 固定，判斷過一次即可沿用到之後的檔案
+anchor_index_name_cache = {}
+
+
+def collect_anchor_attributes(hmc_json, file_name, layer_name, index_name_of, street_section_ref_set,
+                              resolvable_index_name=None):
+    # 走訪 hmc_json 一次，收集 (attribute 名稱, anchor index, attribute) 三個平行 list，
+    # 以及帶有 resolvable_index_name 欄位的 attribute 名稱 (依 hmc_json 順序)
+    attribute_names = []
+    anchor_indexes = []
+    attributes = []
+    resolvable_attribute_names = {}
+    for attribute_name, attribute_list in hmc_json.items():
+        if not isinstance(attribute_list, list) or not attribute_list:
+            continue
+        cache_key = (layer_name, index_name_of, attribute_name)
+        index_name = anchor_index_name_cache.get(cache_key)
+        if index_name is None:
+            index_name = index_name_of(attribute_list)
+            if index_name is None:
+                continue
+            anchor_index_name_cache[cache_key] = index_name
+
+        if attribute_name == 'streetSection':
+            for street_section in attribute_list:
+                street_section_ref = street_section.get('streetSectionRef')
+                if street_section_ref:
+                    street_section_partition_name = street_section_ref.get('partitionName')
+                    if street_section_partition_name:
+                        street_section_ref_set.add(street_section_partition_name)
+
+        attribute_progressbar = ProgressBar(min_value=0, max_value=len(attribute_list),
+                                            prefix='{} - processing {}:'.format(file_name, attribute_name))
+        for attribute_index, attribute in enumerate(attribute_list):
+            if attribute_index & PROGRESSBAR_UPDATE_MASK == 0:
+                attribute_progressbar.update(attribute_index)
+            index_value = attribute.pop(index_name, None)
+            if index_value is None or not attribute:
+                continue
+            if resolvable_index_name in attribute:
+                resolvable_attribute_names[attribute_name] = None
             # 確保是 list
             if isinstance(index_value, int):
                 index_value = [index_value]
-
             for idx in index_value:
-                if attribute == {}:
-                    continue
-                if index_name == 'nodeAnchorIndex':
-                    if not node_anchor_with_attributes_list[idx].get('properties'):
-                        node_anchor_with_attributes_list[idx]['properties'] = {}
-                    node_anchor_with_attributes_list[idx]['properties'][attribute_name] = attribute
-                else:
-                    if not segment_anchor_with_attributes_list[idx].get('properties'):
-                        segment_anchor_with_attributes_list[idx]['properties'] = {}
-                    segment_anchor_with_attributes_list[idx]['properties'][attribute_name] = attribute
-        attribute_index += 1
+                attribute_names.append(attribute_name)
+                anchor_indexes.append(idx)
+                attributes.append(attribute)
+        attribute_progressbar.finish()
+    return attribute_names, anchor_indexes, attributes, list(resolvable_attribute_names)
 
-    attribute_progressbar.finish()
 
+def topology_anchor_attribute_mapping(hmc_json, file_name, layer_name, anchor_list, index_name_of,
+                                      street_section_ref_set, resolvable_index_name=None):
+    # 依 hmc_json 的順序指派，同名 attribute 由後者覆蓋前者；回傳帶有 resolvable_index_name 的 attribute 名稱
+    anchor_properties_list = []
+    for anchor in anchor_list:
+        anchor['properties'] = {}
+        anchor_properties_list.append(anchor['properties'])
+    attribute_names, anchor_indexes, attributes, resolvable_attribute_names = collect_anchor_attributes(
+        hmc_json, file_name, layer_name, index_name_of, street_section_ref_set, resolvable_index_name)
+    for attribute_name, idx, attribute in zip(attribute_names, anchor_indexes, attributes):
+        anchor_properties_list[idx][attribute_name] = attribute
+    return resolvable_attribute_names
 
-segment_anchor_with_attributes_list = []
-node_anchor_with_attributes_list = []
 
 input_layers = ['topology-attributes','advanced-navigation-attributes', 'complex-road-attributes', 'navigation-attributes',
                 'road-attributes', 'traffic-patterns', 'sign-text', 'generalized-junctions-signs',
                 'bicycle-attributes', 'address-attributes', 'adas-attributes', 'truck-attributes',
                 'recreational-vehicle-attributes']
+# <圖層>_<partition>_v<版本>.json
+input_file_name_pattern = re.compile(r'^({})_.*v(\d+)\.json$'.format('|'.join(map(re.escape, input_layers))))
+
+
+@functools.lru_cache(maxsize=None)
+def hmc_external_reference():
+    return HMCExternalReferences()
+
+
+@functools.lru_cache(maxsize=None)
+def segment_pvid(partition_name, segment_identifier):
+    # 同一個 segment 會被多個 anchor 參照，每個 segment 只查詢一次
+    return hmc_external_reference().segment_to_pvid(
+        partition_id=partition_name,
+        segment_ref=Ref(partition=Partition(str(partition_name)), identifier=Identifier(segment_identifier)))
+
+
+TOPOLOGY_CACHE_ARRAYS = ('segment_identifiers', 'segment_point_counts', 'segment_points', 'node_identifiers',
+                         'node_points')
+
+
+def load_topology_reference(partition_folder_path):
+    # Reads the identifiers and coordinates of the topology-geometry segments and nodes. They are kept in a .npz
+    # file next to the topology GeoJSON, which is read instead of parsing the GeoJSON again until it changes
+    topology_geojson_file_path = hmc_layer_cross_referencing.geojson_file_path(partition_folder_path,
+                                                                               'topology-geometry')
+    if topology_geojson_file_path == '':
+        raise FileNotFoundError('topology-geometry geojson not found in {}'.format(partition_folder_path))
+    cache_file_path = '{}.npz'.format(topology_geojson_file_path)
+    if os.path.exists(cache_file_path) and \
+            os.stat(cache_file_path).st_mtime_ns >= os.stat(topology_geojson_file_path).st_mtime_ns:
+        try:
+            with np.load(cache_file_path) as topology_cache:
+                return tuple(topology_cache[name] for name in TOPOLOGY_CACHE_ARRAYS)
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable cache, rebuild it from the GeoJSON
+
+    topology_geometry_reference_segment_list = hmc_layer_cross_referencing.segment_list_generator(partition_folder_path)
+    topology_geometry_reference_node_list = hmc_layer_cross_referencing.node_list_generator(partition_folder_path)
+    segment_features = topology_geometry_reference_segment_list['features']
+    node_features = topology_geometry_reference_node_list['features']
+    topology_arrays = (
+        np.array([segment_feature['properties']['identifier'] for segment_feature in segment_features], dtype=str),
+        np.array([len(segment_feature['geometry']['coordinates']) for segment_feature in segment_features],
+                 dtype=np.int64),
+        np.array([point for segment_feature in segment_features
+                  for point in segment_feature['geometry']['coordinates']], dtype=np.float64).reshape(-1, 2),
+        np.array([node_feature['properties']['identifier'] for node_feature in node_features], dtype=str),
+        np.array([node_feature['geometry']['coordinates'] for node_feature in node_features],
+                 dtype=np.float64).reshape(-1, 2))
+    # Write to a temporary file first so parallel workers never read a half-written cache
+    temporary_cache_file_path = '{}.{}.tmp'.format(cache_file_path, os.getpid())
+    try:
+        with open(temporary_cache_file_path, mode='wb') as temporary_cache_file:
+            np.savez(temporary_cache_file, **dict(zip(TOPOLOGY_CACHE_ARRAYS, topology_arrays)))
+        os.replace(temporary_cache_file_path, cache_file_path)
+    except OSError as e:
+        print('{} --> cannot write topology cache: {}'.format(cache_file_path, e))
+    return topology_arrays
+
+
+@functools.lru_cache(maxsize=4)
+def topology_reference_maps(partition_folder_path):
+    # 同一個目錄下的圖層檔案共用 topology，索引只建一次
+    segment_identifiers, segment_point_counts, segment_points, node_identifiers, node_points = \
+        load_topology_reference(partition_folder_path)
+
+    # create segment identifier index: identifier -> position in the parallel segment lists below
+    segment_index_map = {identifier: i for i, identifier in enumerate(segment_identifiers.tolist())}
+    segment_point_offsets = np.concatenate(([0], np.cumsum(segment_point_counts))).tolist()
+    segment_coordinates_list = [segment_points[start:end] for start, end in
+                                zip(segment_point_offsets[:-1], segment_point_offsets[1:])]
+    # (vertex array, vertex distances) of each segment, built on first use
+    segment_measures_list = [None] * len(segment_coordinates_list)
+    # rounded output coordinates of each whole segment, built on first use
+    segment_full_coordinates_list = [None] * len(segment_coordinates_list)
+    # create node coordinates index
+    node_coordinates_map = dict(zip(node_identifiers.tolist(), node_points.tolist()))
+    return (segment_index_map, segment_coordinates_list, segment_measures_list, segment_full_coordinates_list,
+            node_coordinates_map)
+
+
+def process_file(r, f, road_attribute_layer, partition_version, overwrite_result, pretty=False):
+    # 轉換一個圖層檔案；回傳寫出的 geojson 路徑、streetSection 參照的 partition 與 partition 版本
+    street_section_ref_set = set()
+    output_file_paths = []
+    hmc_decoded_json_file_path = os.path.join(r, f)
+    print(hmc_decoded_json_file_path)
+    hmc_json = load_json(hmc_decoded_json_file_path)
+    partition_name = hmc_json['partitionName']
+
+    segment_anchor_with_attributes_list = hmc_json.get('segmentAnchor') or []
+    node_anchor_with_attributes_list = hmc_json.get('nodeAnchor') or []
+
+    segment_index_map, segment_coordinates_list, segment_measures_list, segment_full_coordinates_list, \
+        node_coordinates_map = topology_reference_maps(r)
+
+    if segment_anchor_with_attributes_list:
+        segment_output_geojson_file_path = os.path.join(r, '{}_segments.geojson'.format(f))
+        if os.path.exists(segment_output_geojson_file_path) and overwrite_result != 'y':
+            print('{} --> existing already.'.format(segment_output_geojson_file_path))
+        else:
+            with open(segment_output_geojson_file_path, mode='wb',
+                      buffering=WRITE_BUFFER_SIZE) as segment_output_geojson_file, \
+                    FeatureCollectionWriter(segment_output_geojson_file, pretty) as segment_feature_writer:
+                segment_anchor_with_attributes_index = 0
+                segment_process_progressbar = ProgressBar(min_value=0, max_value=len(
+                    segment_anchor_with_attributes_list), prefix='{} - processing segments:'.format(
+                    f))
+
+                topology_anchor_attribute_mapping(hmc_json, f, road_attribute_layer,
+                                                  segment_anchor_with_attributes_list, segment_anchor_index_name,
+                                                  street_section_ref_set)
+                for segment_anchor_with_attributes in segment_anchor_with_attributes_list:
+                    if segment_anchor_with_attributes_index & PROGRESSBAR_UPDATE_MASK == 0:
+                        segment_process_progressbar.update(segment_anchor_with_attributes_index)
+                    segment_anchor_with_attributes_index += 1
+                    segment_start_offset = segment_anchor_with_attributes.get('firstSegmentStartOffset') or 0.0
+                    segment_end_offset = segment_anchor_with_attributes.get('lastSegmentEndOffset') or 1.0
+                    # anchor 涵蓋整條 segment 時直接沿用整條 segment 的座標
+                    whole_segment = segment_start_offset == 0.0 and segment_end_offset == 1.0
+                    oriented_segment_refs = segment_anchor_with_attributes['orientedSegmentRef']
+                    for oriented_segment_ref in oriented_segment_refs:
+                        segment_ref = oriented_segment_ref['segmentRef']
+                        segment_ref_partition_name = segment_ref['partitionName']
+                        segment_ref_identifier = segment_ref['identifier']
+                        segment_index = segment_index_map.get(segment_ref_identifier)
+                        if segment_index is not None:
+                            if whole_segment:
+                                feature_geometry_with_offsets_coordinates = \
+                                    segment_full_coordinates_list[segment_index]
+                            else:
+                                feature_geometry_with_offsets_coordinates = None
+                            if feature_geometry_with_offsets_coordinates is None:
+                                segment_measures = segment_measures_list[segment_index]
+                                if segment_measures is None:
+                                    segment_measures = segment_measures_list[segment_index] = \
+                                        line_measures(segment_coordinates_list[segment_index])
+                                feature_vertices, feature_vertex_distances = segment_measures
+                                if whole_segment:
+                                    feature_geometry_with_offsets_coordinates = \
+                                        segment_full_coordinates_list[segment_index] = round_coordinates(
+                                            line_full_coordinates(feature_vertices, feature_vertex_distances))
+                                else:
+                                    feature_geometry_length = feature_vertex_distances[-1]
+                                    feature_geometry_offset_length_start = \
+                                        feature_geometry_length * segment_start_offset
+                                    feature_geometry_offset_length_end = feature_geometry_length * segment_end_offset
+                                    feature_geometry_with_offsets_coordinates = round_coordinates(line_substring(
+                                        feature_vertices, feature_vertex_distances,
+                                        feature_geometry_offset_length_start,
+                                        feature_geometry_offset_length_end))
+                            if segment_start_offset == segment_end_offset:
+                                segment_anchor_geometry = {'type': 'Point',
+                                                           'coordinates': feature_geometry_with_offsets_coordinates[0]}
+                            else:
+                                segment_anchor_geometry = {'type': 'LineString',
+                                                           'coordinates': feature_geometry_with_offsets_coordinates}
+                            segment_anchor_geojson_feature = {'type': 'Feature', 'geometry': segment_anchor_geometry,
+                                                              'properties': segment_anchor_with_attributes}
+                            props = segment_anchor_geojson_feature['properties']
+                            # props 在走訪時不能新增 key，解析結果留到迴圈後再寫入
+                            resolved = None
+                            for attr_val in props.values():
+                                if isinstance(attr_val, dict) and 'nodeAnchorIndex' in attr_val:
+                                    indices = attr_val['nodeAnchorIndex']
+                                    if isinstance(indices, int):
+                                        indices = [indices]
+                                    resolved = [node_anchor_with_attributes_list[idx] for idx in indices
+                                                if 0 <= idx < len(node_anchor_with_attributes_list)]
+                            if resolved is not None:
+                                props["resolvedNodeAnchors"] = resolved
+                            # Get LINK PVID with HMC Segment ID
+                            # segment_anchor_geojson_feature['properties'][
+                            #     'hmcExternalReference'] = {}
+                            # segment_anchor_geojson_feature['properties'][
+                            #     'hmcExternalReference'][
+                            #     'pvid'] = segment_pvid(partition_name, segment_ref['identifier'])
+
+                            segment_feature_writer.write(segment_anchor_geojson_feature)
+                segment_process_progressbar.finish()
+            output_file_paths.append(segment_output_geojson_file_path)
+
+    if node_anchor_with_attributes_list:
+        node_output_geojson_file_path = os.path.join(r,
+                                                     '{}_nodes.geojson'.format(f))
+        if os.path.exists(node_output_geojson_file_path) and overwrite_result != 'y':
+            print('{} --> existing already.'.format(node_output_geojson_file_path))
+        else:
+            with open(node_output_geojson_file_path, mode='wb',
+                      buffering=WRITE_BUFFER_SIZE) as node_output_geojson_file, \
+                    FeatureCollectionWriter(node_output_geojson_file, pretty) as node_feature_writer:
+                node_anchor_with_attributes_index = 0
+                node_process_progressbar = ProgressBar(min_value=0,
+                                                       max_value=len(
+                                                           node_anchor_with_attributes_list),
+                                                       prefix='{} - processing nodes:'.format(f))
+
+                # 帶有 segmentAnchorIndex 的 node attribute，輸出時附上對應的 segment anchor
+                segment_resolvable_attribute_names = topology_anchor_attribute_mapping(
+                    hmc_json, f, road_attribute_layer, node_anchor_with_attributes_list, node_anchor_index_name,
+                    street_section_ref_set, 'segmentAnchorIndex')
+                for node_anchor_with_attributes in node_anchor_with_attributes_list:
+                    if node_anchor_with_attributes_index & PROGRESSBAR_UPDATE_MASK == 0:
+                        node_process_progressbar.update(node_anchor_with_attributes_index)
+                    node_anchor_with_attributes_index += 1
+                    node_ref = node_anchor_with_attributes['nodeRef']
+                    node_ref_partition_name = node_ref['partitionName']
+                    node_ref_identifier = node_ref['identifier']
+                    node_coordinates = node_coordinates_map.get(node_ref_identifier)
+                    if node_coordinates is not None:
+                        node_anchor_geojson_feature = {
+                            'type': 'Feature',
+                            'geometry': {'type': 'Point', 'coordinates': node_coordinates},
+                            'properties': node_anchor_with_attributes['properties']}
+                        props = node_anchor_geojson_feature['properties']
+                        for attr_key in segment_resolvable_attribute_names:
+                            attr_val = props.get(attr_key)
+                            if attr_val is not None and 'segmentAnchorIndex' in attr_val:
+                                indices = attr_val['segmentAnchorIndex']
+                                if isinstance(indices, int):
+                                    indices = [indices]
+                                resolved = [segment_anchor_with_attributes_list[idx] for idx in indices
+                                            if 0 <= idx < len(segment_anchor_with_attributes_list)]
+                                props["resolvedSegmentAnchors"] = resolved
+                        node_feature_writer.write(node_anchor_geojson_feature)
+                node_process_progressbar.finish()
+            output_file_paths.append(node_output_geojson_file_path)
+    return output_file_paths, street_section_ref_set, partition_version
+
+
+def download_street_name_partitions(street_section_ref_set, partition_version):
+    print('street-name reference partitions: ', list(street_section_ref_set))
+    street_name_reference_layers = ['street-names']
+    print('download street-name reference layers: {}'.format(', '.join(street_name_reference_layers)))
+    platform = get_platform()
+    env = platform.environment
+    config = platform.platform_config
+    print('HERE Platform Status: ', platform.get_status())
+    platform_catalog = get_catalog('hrn:here:data::olp-here:rib-2')
+    for street_name_reference_layer in street_name_reference_layers:
+        street_name_downloader = HmcDownloader(catalog=platform_catalog, layer=street_name_reference_layer,
+                                               file_format=FileFormat.JSON, version=partition_version)
+        # 磁碟上已有同一 partition 版本檔案的 partition 不再重新下載，版本不同則重新下載
+        street_name_partitions = sorted(street_section_ref_set - street_name_downloader.get_downloaded_partition_ids(
+            'generic', list(street_section_ref_set)))
+        if street_name_partitions:
+            street_name_downloader.download_generic_layer(quad_ids=street_name_partitions,
+                                                          version=partition_version)
+        else:
+            print('{} partitions --> existing already.'.format(street_name_reference_layer))
+
 
 if __name__ == '__main__':
     import argparse
@@ -74,206 +465,38 @@ if __name__ == '__main__':
     parser.add_argument('partition_path', help='path of partition folder', type=str)
     parser.add_argument('overwrite_result', help='overwrite geojson result file (y/N)', nargs='?', default='n',
                         type=str)
+    parser.add_argument('--workers', help='number of files converted in parallel (default: CPU count)',
+                        type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pretty', help='indent the geojson output (default: compact)', action='store_true')
     args = parser.parse_args()
     partition_folder_path = args.partition_path
     overwrite_result = str.lower(args.overwrite_result)
 
     street_section_ref_set = set()
 
-    # hmc_external_reference = HMCExternalReferences()
-
+    input_files = []
     for r, d, fs in os.walk(partition_folder_path):
         for f in fs:
-            for road_attribute_layer in input_layers:
-                if re.match('^{}_.*\.json$'.format(road_attribute_layer), f):
-                    partition_version = int(re.search(r'v(\d+)', f).group(1))
-                    hmc_decoded_json_file_path = os.path.join(r, f)
-                    print(hmc_decoded_json_file_path)
-                    with open(hmc_decoded_json_file_path, mode='r', encoding='utf-8') as hmc_json:
-                        hmc_json = json.loads(hmc_json.read())
-                        final_feature_collection = []
-                        partition_name = hmc_json['partitionName']
-
-                        segment_anchor_with_attributes_list = hmc_json.get('segmentAnchor')
-                        node_anchor_with_attributes_list = hmc_json.get('nodeAnchor')
-
-                        topology_geometry_reference_segment_list = hmc_layer_cross_referencing.segment_list_generator(r)
-                        topology_geometry_reference_node_list = hmc_layer_cross_referencing.node_list_generator(r)
-
-                        # create segment identifier index
-                        segment_feature_map = {
-                            segment_feature['properties']['identifier']: segment_feature
-                            for segment_feature in topology_geometry_reference_segment_list['features']
-                        }
-
-                        if segment_anchor_with_attributes_list:
-                            segment_anchor_dict = {i: sa for i, sa in enumerate(segment_anchor_with_attributes_list)}
-                            segment_output_geojson_file_path = os.path.join(r, '{}_segments.geojson'.format(f))
-                            if os.path.exists(segment_output_geojson_file_path) and overwrite_result != 'y':
-                                print('{} --> existing already.'.format(segment_output_geojson_file_path))
-                            else:
-                                with open(segment_output_geojson_file_path, mode='w',
-                                          encoding='utf-8') as segment_output_geojson_file_path:
-                                    segment_anchor_with_attributes_index = 0
-                                    segment_process_progressbar = ProgressBar(min_value=0, max_value=len(
-                                        segment_anchor_with_attributes_list), prefix='{} - processing segments:'.format(
-                                        f))
-
-                                    for segment_anchor in segment_anchor_with_attributes_list:
-                                        segment_anchor['properties'] = {}
-                                    for key in list(hmc_json.keys()):
-                                        if isinstance(hmc_json[key], list):
-                                            if len(hmc_json[key])>0:
-                                                if hmc_json[key][0].get('segmentAnchorIndex'):
-                                                    topology_anchor_attribute_mapping(key, 'segmentAnchorIndex')
-                                                elif isinstance(hmc_json[key][0], dict) and \
-                                                    hmc_json[key][0].get('originSegmentAnchorIndex'):
-                                                    topology_anchor_attribute_mapping(key, 'originSegmentAnchorIndex')
-                                                elif isinstance(hmc_json[key][0], dict) and \
-                                                hmc_json[key][0].get('originatingSegmentAnchorIndex'):
-                                                    topology_anchor_attribute_mapping(key, 'originatingSegmentAnchorIndex')
-                                        # for hmc_json_key_element in hmc_json[key]:
-                                        #     print(type(hmc_json_key_element), hmc_json_key_element)
-                                    segment_anchor_with_topology_list = []
-                                    for segment_anchor_with_attributes in segment_anchor_with_attributes_list:
-                                        segment_process_progressbar.update(segment_anchor_with_attributes_index)
-                                        segment_anchor_with_attributes_index += 1
-                                        oriented_segment_refs = segment_anchor_with_attributes['orientedSegmentRef']
-                                        for oriented_segment_ref in oriented_segment_refs:
-                                            segment_ref = oriented_segment_ref['segmentRef']
-                                            segment_ref_partition_name = segment_ref['partitionName']
-                                            segment_ref_identifier = segment_ref['identifier']
-                                            segment_feature = segment_feature_map.get(segment_ref_identifier)
-                                            if segment_feature:
-                                                segment_anchor_geojson_feature = geojson.Feature()
-                                                segment_start_offset = 0.0
-                                                segment_end_offset = 1.0
-                                                if segment_anchor_with_attributes.get('firstSegmentStartOffset'):
-                                                    segment_start_offset = segment_anchor_with_attributes.get(
-                                                        'firstSegmentStartOffset')
-                                                if segment_anchor_with_attributes.get('lastSegmentEndOffset'):
-                                                    segment_end_offset = segment_anchor_with_attributes.get(
-                                                        'lastSegmentEndOffset')
-                                                feature_geometry_length = shapely.geometry.LineString(
-                                                    shapely.from_geojson(str(segment_feature.geometry))).length
-                                                feature_geometry_offset_length_start = feature_geometry_length * segment_start_offset
-                                                feature_geometry_offset_length_end = feature_geometry_length * segment_end_offset
-                                                feature_geometry_with_offsets = shapely. ops.substring(
-                                                    geom=shapely.from_geojson(str(segment_feature.geometry)),
-                                                    start_dist=feature_geometry_offset_length_start,
-                                                    end_dist=feature_geometry_offset_length_end)
-                                                segment_anchor_geojson_feature.properties = segment_anchor_with_attributes
-                                                feature_geometry_with_offsets_geojson = geojson.loads(
-                                                    shapely.to_geojson(feature_geometry_with_offsets))
-                                                if segment_start_offset == segment_end_offset:
-                                                    segment_anchor_geojson_feature.type = 'Feature'
-                                                    segment_anchor_geojson_feature.geometry = geojson.geometry.Point(
-                                                        feature_geometry_with_offsets_geojson)
-                                                else:
-                                                    segment_anchor_geojson_feature.type = 'Feature'
-                                                    segment_anchor_geojson_feature.geometry = geojson.geometry.LineString(
-                                                        feature_geometry_with_offsets_geojson)
-                                                props = segment_anchor_geojson_feature.properties
-                                                for attr_key, attr_val in list(props.items()):
-                                                    if isinstance(attr_val, dict) and 'nodeAnchorIndex' in attr_val:
-                                                        indices = attr_val['nodeAnchorIndex']
-                                                        if isinstance(indices, int):
-                                                            indices = [indices]
-                                                        resolved = [node_anchor_dict.get(idx) for idx in indices if
-                                                                    idx in node_anchor_dict]
-                                                        props[f"resolvedNodeAnchors"] = resolved
-                                                    # Get LINK PVID with HMC Segment ID
-                                                    # segment_anchor_geojson_feature.properties[
-                                                    #     'hmcExternalReference'] = {}
-                                                    # segment_anchor_geojson_feature.properties[
-                                                    #     'hmcExternalReference'][
-                                                    #     'pvid'] = hmc_external_reference.segment_to_pvid(
-                                                    #     partition_id=partition_name,
-                                                    #     segment_ref=Ref(partition=Partition(str(partition_name)),
-                                                    #                     identifier=Identifier(
-                                                    #                         segment_ref['identifier'])))
-
-                                                segment_anchor_with_topology_list.append(
-                                                    segment_anchor_geojson_feature)
-                                    segment_anchor_with_topology_feature_collection = geojson.FeatureCollection(
-                                        segment_anchor_with_topology_list)
-                                    segment_process_progressbar.finish()
-                                    segment_output_geojson_file_path.write(
-                                        json.dumps(segment_anchor_with_topology_feature_collection, indent='    '))
-
-                        if node_anchor_with_attributes_list:
-                            node_anchor_dict = {i: na for i, na in enumerate(node_anchor_with_attributes_list)}
-                            node_output_geojson_file_path = os.path.join(r,
-                                                                         '{}_nodes.geojson'.format(f))
-                            if os.path.exists(node_output_geojson_file_path) and overwrite_result != 'y':
-                                print('{} --> existing already.'.format(node_output_geojson_file_path))
-                            else:
-                                with open(node_output_geojson_file_path, mode='w',
-                                          encoding='utf-8') as node_output_geojson_file:
-                                    node_anchor_with_attributes_index = 0
-                                    node_process_progressbar = ProgressBar(min_value=0,
-                                                                           max_value=len(
-                                                                               node_anchor_with_attributes_list),
-                                                                           prefix='{} - processing nodes:'.format(f))
-                                    # create node feature index
-                                    node_feature_map = {
-                                        node_feature['properties']['identifier']: node_feature
-                                        for node_feature in topology_geometry_reference_node_list['features']
-                                    }
-
-                                    for node_anchor in node_anchor_with_attributes_list:
-                                        node_anchor['properties'] = {}
-                                    for key in list(hmc_json.keys()):
-                                        if isinstance(hmc_json[key], list):
-                                            for hmc_json_element in hmc_json[key]:
-                                                if hmc_json_element.get('nodeAnchorIndex'):
-                                                    topology_anchor_attribute_mapping(key, 'nodeAnchorIndex')
-                                    node_anchor_with_topology_list = []
-                                    for node_anchor_with_attributes in node_anchor_with_attributes_list:
-                                        node_process_progressbar.update(node_anchor_with_attributes_index)
-                                        node_anchor_with_attributes_index += 1
-                                        node_ref = node_anchor_with_attributes['nodeRef']
-                                        node_ref_partition_name = node_ref['partitionName']
-                                        node_ref_identifier = node_ref['identifier']
-                                        node_feature = node_feature_map.get(node_ref_identifier)
-                                        if node_feature:
-                                            node_anchor_geojson_feature = geojson.Feature()
-                                            node_anchor_geojson_feature.geometry = geojson.geometry.Point(
-                                                node_feature.geometry)
-                                            node_anchor_geojson_feature.properties = node_anchor_with_attributes[
-                                                'properties']
-                                            props = node_anchor_geojson_feature.properties
-                                            for attr_key, attr_val in list(props.items()):
-                                                if isinstance(attr_val, dict) and 'segmentAnchorIndex' in attr_val:
-                                                    indices = attr_val['segmentAnchorIndex']
-                                                    if isinstance(indices, int):
-                                                        indices = [indices]
-                                                    resolved = [segment_anchor_dict.get(idx) for idx in indices if
-                                                                idx in segment_anchor_dict]
-                                                    props[f"resolvedSegmentAnchors"] = resolved
-                                            node_anchor_with_topology_list.append(node_anchor_geojson_feature)
-                                    node_process_progressbar.finish()
-
-                                    node_anchor_with_topology_feature_collection = geojson.FeatureCollection(
-                                        node_anchor_with_topology_list)
-                                    final_feature_collection.append(node_anchor_with_topology_feature_collection)
-                                    node_output_geojson_file.write(
-                                        json.dumps(node_anchor_with_topology_feature_collection, indent='    '))
-                        if len(street_section_ref_set) > 0 and road_attribute_layer == 'address-attributes':
-                            print('street-name reference partitions: ', list(street_section_ref_set))
-                            # for street_name_partition in list(street_section_ref_set):
-                            #     if os.
-                            #
-                            # 'decoded/hrn_here_data__olp-here_rib-2/generic/20252820-20291912/street-names_20252820-20291912_v7066.json'
-                            street_name_reference_layers = ['street-names']
-                            print('download street-name reference layers: {}'.format(', '.join(street_name_reference_layers)))
-                            platform = Platform()
-                            env = platform.environment
-                            config = platform.platform_config
-                            print('HERE Platform Status: ', platform.get_status())
-                            platform_catalog = platform.get_catalog(hrn='hrn:here:data::olp-here:rib-2')
-                            for street_name_partition in list(street_section_ref_set):
-                                for street_name_reference_layer in street_name_reference_layers:
-                                    HmcDownloader(catalog=platform_catalog, layer=street_name_reference_layer,
-                                                  file_format=FileFormat.JSON, version=partition_version).download_generic_layer(
-                                        quad_ids=[street_name_partition], version=partition_version)
+            input_file_name_match = input_file_name_pattern.match(f)
+            if input_file_name_match:
+                road_attribute_layer, partition_version = input_file_name_match.group(1), int(
+                    input_file_name_match.group(2))
+                input_files.append((r, f, road_attribute_layer, partition_version))
+
+    # street-names 以 address-attributes 的 partition 版本下載，取最新的一個
+    street_name_partition_version = None
+    if input_files:
+        # 每個檔案互相獨立，分給多個 process 同時轉換
+        with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(input_files)))) as executor:
+            futures = {executor.submit(process_file, r, f, road_attribute_layer, partition_version, overwrite_result,
+                                       args.pretty): road_attribute_layer
+                       for r, f, road_attribute_layer, partition_version in input_files}
+            for future in as_completed(futures):
+                output_file_paths, file_street_section_ref_set, partition_version = future.result()
+                street_section_ref_set.update(file_street_section_ref_set)
+                if futures[future] == 'address-attributes':
+                    street_name_partition_version = max(partition_version, street_name_partition_version or 0)
+
+    # 所有檔案處理完後，一次下載全部參照到的 street-names partition
+    if len(street_section_ref_set) > 0 and street_name_partition_version is not None:
+        download_street_name_partitions(street_section_ref_set, street_name_partition_version)
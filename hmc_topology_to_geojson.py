@@ -50,7 +50,7 @@ class HmcTopologyToGeoJson:
                                     node_geometry.coordinates = [node['geometry']['longitude'],
                                                                  node['geometry']['latitude']]
                                     node_feature.geometry = node_geometry
-                                    for node_key in list(node.keys()):
+                                    for node_key in node.keys():
                                         node_feature.properties[node_key] = node[node_key]
                                     node_feature_list.append(node_feature)
                                 node_feature_collection = geojson.FeatureCollection(node_feature_list)
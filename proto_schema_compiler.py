@@ -1,5 +1,7 @@
 import os
 import argparse
+import subprocess
+import sys
 
 parser = argparse.ArgumentParser()
 
@@ -7,10 +9,20 @@ parser.add_argument('-r', '--root', help='root of protobuf schema.')
 
 args = parser.parse_args()
 proto_root = args.root
+failed_protos = []
 
 for r, d, fs in os.walk(proto_root):
     for f in fs:
         if os.path.splitext(f)[-1] == '.proto':
-            protoc_cmd = 'protoc -I={} --python_out={} {}'.format(proto_root, proto_root, os.path.join(r, f))
-            print(protoc_cmd)
-            os.system(protoc_cmd)
+            protoc_cmd = ['protoc', '-I={}'.format(proto_root), '--python_out={}'.format(proto_root), os.path.join(r, f)]
+            print(' '.join(protoc_cmd))
+            result = subprocess.run(protoc_cmd, check=False)
+            if result.returncode != 0:
+                print('protoc failed on {} (return code: {})'.format(os.path.join(r, f), result.returncode))
+                failed_protos.append(os.path.join(r, f))
+
+if failed_protos:
+    print('{} proto files failed to compile:'.format(len(failed_protos)))
+    for failed_proto in failed_protos:
+        print('  {}'.format(failed_proto))
+    sys.exit(1)